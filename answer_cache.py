@@ -0,0 +1,268 @@
+"""상담 챗봇의 의미 기반 답변 캐시 (네트워크 없이 동작).
+
+"연수 학점은 어떻게 인정되나요?"처럼 교사마다 되풀이되는 질문은 비슷한 질문에 했던 답변을 그대로 씁니다.
+- 질문은 한글 문자 n-gram을 해시해 고정 차원 벡터로 만들고(임베딩 모델 없음), 단위 벡터로 정규화합니다.
+- 학교급, 경력 구간, 관심 분야의 상위 분류, 선호 연수 형태(context)가 같은 답변만 쓰므로, 벡터를 context별
+  NumPy 행렬에 나눠 담고 질문 하나당 해당 행렬과의 곱 한 번으로 가장 비슷한 답변을 찾습니다 (10만 건에서도 수 밀리초).
+- 오래된 답변은 만료되며, 가득 차면 가장 오래 안 쓰인 것부터 지웁니다.
+- 메모리에는 벡터와 key만 두고 답변 본문은 SQLite에 두었다가 적중했을 때만 읽습니다.
+  path를 주면 파일에 남겨 재시작 후에도 다시 불러오고, 없으면 메모리 DB를 씁니다.
+특정 연수명을 묻는 질문이나 "그 연수", "두 번째" 같이 앞 대화에 기대는 질문은 캐시를 거치지 않고,
+교사 이름/담당 과목/추천 연수명이 들어간 답변은 다른 교사에게 보여주지 않도록 저장하지 않습니다.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from catalog import char_ngrams
+
+FOLLOW_UP_MARKERS = ("그 연수", "그거", "그것", "이 연수", "위 연수", "방금", "앞에서", "더 자세히",
+                     "첫 번째", "두 번째", "세 번째", "1번", "2번", "3번")
+
+
+def embed(text, dim=256):
+    # 문자 n-gram마다 crc32로 차원과 부호를 정합니다 (프로세스가 바뀌어도 같은 값이 나오도록 hash()는 쓰지 않음)
+    # 띄어쓰기가 제각각이어도 비슷하게 나오도록 어절별 n-gram에 공백을 지운 문장의 n-gram을 더합니다
+    vector = np.zeros(dim, dtype=np.float32)
+    for gram in char_ngrams(text) + char_ngrams("".join(text.split())):
+        h = zlib.crc32(gram.encode("utf-8"))
+        vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def context_key(school_level, experience_bucket, interest_categories=(), preference=""):
+    # 관심 분야는 세부 항목 대신 상위 분류(recommender.interest_categories)로 넘겨 적중률을 지킵니다
+    categories = ",".join(sorted(interest_categories))
+    return zlib.crc32(f"{school_level}|{experience_bucket}|{categories}|{preference}".encode("utf-8"))
+
+
+def should_bypass(question, course_titles=()):
+    # 특정 연수나 앞 대화를 가리키는 질문은 다른 교사의 답변으로 대신할 수 없습니다
+    return (any(title and title in question for title in course_titles)
+            or any(marker in question for marker in FOLLOW_UP_MARKERS))
+
+
+def is_shareable(answer, private_terms=()):
+    return not any(term and term in answer for term in private_terms)
+
+
+class _Shard:
+    """context 하나의 답변 벡터와 key. 행을 빈틈없이 채워 두어 검색은 앞쪽 len(self)행만 봅니다."""
+
+    def __init__(self, dim):
+        self.vectors = np.zeros((64, dim), dtype=np.float32)
+        self.created = np.zeros(64, dtype=np.float64)
+        self.last_used = np.zeros(64, dtype=np.float64)
+        self.keys = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, vector, created, last_used):
+        row = len(self.keys)
+        if row == len(self.vectors):
+            # 두 배씩 늘립니다
+            self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+            self.created = np.concatenate([self.created, np.zeros_like(self.created)])
+            self.last_used = np.concatenate([self.last_used, np.zeros_like(self.last_used)])
+        self.keys.append(key)
+        self.update(row, vector, created, last_used)
+        return row
+
+    def update(self, row, vector, created, last_used):
+        self.vectors[row] = vector
+        self.created[row] = created
+        self.last_used[row] = last_used
+
+    def remove(self, row):
+        """마지막 행을 빈자리로 옮기고, 옮겨진 행의 key를 돌려줍니다 (없으면 None)."""
+        last = len(self.keys) - 1
+        moved = None
+        if row != last:
+            moved = self.keys[last]
+            self.vectors[row] = self.vectors[last]
+            self.created[row] = self.created[last]
+            self.last_used[row] = self.last_used[last]
+            self.keys[row] = moved
+        self.keys.pop()
+        return moved
+
+    def search(self, query, expires_before):
+        n = len(self.keys)
+        scores = self.vectors[:n] @ query
+        scores[self.created[:n] <= expires_before] = -1.0
+        row = int(np.argmax(scores))
+        return row, float(scores[row])
+
+
+class AnswerCache:
+    def __init__(self, path=None, capacity=100_000, dim=256, threshold=0.92, max_age=30 * 24 * 3600,
+                 purge_interval=3600):
+        self.path = path
+        self.capacity = capacity
+        self.dim = dim
+        self.threshold = threshold
+        self.max_age = max_age
+        self.purge_interval = purge_interval
+        self._next_purge = time.time() + purge_interval
+        self._shards = {}   # context -> _Shard
+        self._rows = {}     # key -> (context, row)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path or ":memory:", timeout=5, check_same_thread=False)
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, context INTEGER NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL, "
+            "vector BLOB NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.commit()
+        if path:
+            self._load()
+
+    def lookup(self, question, context, course_titles=(), now=None):
+        """(답변, 유사도)를 돌려주며, 임계값을 넘는 답변이 없으면 (None, 최고 유사도), 캐시를 거치지 않을 질문이면 (None, None)."""
+        if should_bypass(question, course_titles):
+            with self._lock:
+                self.bypassed += 1
+            return None, None
+        now = now or time.time()
+        query = embed(question, self.dim)
+        with self._lock:
+            shard = self._shards.get(context)
+            if not shard:
+                self.misses += 1
+                return None, 0.0
+            row, score = shard.search(query, now - self.max_age)
+            if score < self.threshold:
+                self.misses += 1
+                return None, max(score, 0.0)
+            key = shard.keys[row]
+            found = self._conn.execute("SELECT answer FROM answers WHERE key = ?", (key,)).fetchone()
+            if found is None:
+                # 다른 프로세스가 파일에서 지운 답변은 메모리에서도 지웁니다
+                self._remove(key)
+                self.misses += 1
+                return None, 0.0
+            shard.last_used[row] = now
+            self.hits += 1
+            self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return found[0], score
+
+    def store(self, question, context, answer, private_terms=(), now=None):
+        if not is_shareable(answer, private_terms):
+            return False
+        now = now or time.time()
+        key = hashlib.sha256(f"{context}\n{question.strip()}".encode("utf-8")).hexdigest()
+        vector = embed(question, self.dim)
+        with self._lock:
+            self._place(key, context, vector, now, now, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, context, question, answer, vector, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, context, question, answer, vector.tobytes(), now, now),
+            )
+            self._conn.commit()
+        if now >= self._next_purge:
+            self.purge_expired(now)
+        return True
+
+    def purge_expired(self, now=None):
+        # 저장할 때 purge_interval마다 한 번씩 불립니다
+        now = now or time.time()
+        expires_before = now - self.max_age
+        with self._lock:
+            self._next_purge = now + self.purge_interval
+            expired = [shard.keys[row] for shard in self._shards.values()
+                       for row in np.flatnonzero(shard.created[:len(shard)] <= expires_before)]
+            for key in expired:
+                self._remove(key)
+            self._conn.execute("DELETE FROM answers WHERE created_at <= ?", (expires_before,))
+            self._conn.commit()
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._rows),
+                "vector_bytes": sum(shard.vectors.nbytes for shard in self._shards.values()),
+            }
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _place(self, key, context, vector, created, last_used, now):
+        # self._lock을 잡은 상태에서 부릅니다
+        found = self._rows.get(key)
+        if found is not None:
+            self._shards[found[0]].update(found[1], vector, created, last_used)
+            return
+        if len(self._rows) >= self.capacity:
+            self._evict(now)
+        shard = self._shards.get(context)
+        if shard is None:
+            shard = self._shards[context] = _Shard(self.dim)
+        self._rows[key] = (context, shard.add(key, vector, created, last_used))
+
+    def _evict(self, now):
+        # 만료된 답변이 있으면 그것부터, 없으면 가장 오래 안 쓰인 답변을 지웁니다
+        expires_before = now - self.max_age
+        victim = None
+        for shard in self._shards.values():
+            n = len(shard)
+            if not n:
+                continue
+            row = int(np.argmin(shard.created[:n]))
+            if shard.created[row] <= expires_before:
+                victim = (-np.inf, shard.keys[row])
+                break
+            row = int(np.argmin(shard.last_used[:n]))
+            if victim is None or shard.last_used[row] < victim[0]:
+                victim = (shard.last_used[row], shard.keys[row])
+        if victim is not None:
+            self._remove(victim[1])
+            self._conn.execute("DELETE FROM answers WHERE key = ?", (victim[1],))
+
+    def _remove(self, key):
+        context, row = self._rows.pop(key)
+        shard = self._shards[context]
+        moved = shard.remove(row)
+        if moved is not None:
+            self._rows[moved] = (context, row)
+        if not len(shard):
+            del self._shards[context]
+
+    def _load(self):
+        # 만료된 답변은 파일에서도 지우고, 최근에 쓰인 답변이 남도록 오래된 것부터 채웁니다 (용량을 넘으면 LRU로 밀려남)
+        now = time.time()
+        cutoff = now - self.max_age
+        self._conn.execute("DELETE FROM answers WHERE created_at <= ?", (cutoff,))
+        rows = self._conn.execute(
+            "SELECT key, context, vector, created_at, last_used FROM answers "
+            "WHERE created_at > ? ORDER BY last_used", (cutoff,)
+        ).fetchall()
+        with self._lock:
+            for key, context, blob, created, last_used in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                if vector.shape[0] == self.dim:
+                    self._place(key, context, vector, created, last_used, now)
+            self._conn.commit()
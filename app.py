@@ -1,7 +1,60 @@
+import time
+
+script_started = time.perf_counter()
+
 import streamlit as st
-from openai import OpenAI
+import openai
 import json
-from datetime import datetime
+import os
+import re
+import uuid
+
+from recommender import (
+    CATEGORIES, PREFERENCES, SCHOOL_LEVELS, TIME_PREFERENCES,
+    build_chat_system_prompt, build_recommendation_prompt, build_rerank_prompt, experience_bucket, interest_categories,
+    normalize_profile,
+)
+from cards import course_card_html, message_html
+from chat_context import ChatContext
+from prefetch import Prefetcher
+from llm_client import CircuitOpenError, DeadlineExceededError, ResilientLLM, StreamInterruptedError, create_client
+from answer_cache import AnswerCache, context_key
+from catalog import (
+    CatalogIndex, catalog_course_card, catalog_version, format_candidates, load_catalog, match_candidate, search_profile,
+)
+from rec_cache import PrecomputedStore, RecommendationCache
+from session_store import ChatHistory, SessionStore
+from streaming import iter_stream_text, prompt_key, stream_recommendations
+from telemetry import Telemetry, usage_tokens
+from throttle import FlightAbortedError, SingleFlight, TokenBucketLimiter
+
+# 업스트림 장애로 보고 캐시/카탈로그로 대신 응답할 오류
+UPSTREAM_ERRORS = (CircuitOpenError, DeadlineExceededError, StreamInterruptedError, openai.APIError)
+
+LLM_DEADLINE_SECONDS = float(os.environ.get("OPENAI_DEADLINE_SECONDS", "30"))
+
+# 단계별 지연 시간/토큰 계측 (TELEMETRY_ENABLED=1일 때만 기록)
+@st.cache_resource
+def get_telemetry():
+    return Telemetry.from_env()
+
+telemetry = get_telemetry()
+TELEMETRY_ADMIN = os.environ.get("TELEMETRY_ADMIN", "0") == "1"
+
+# OpenAI 클라이언트는 프로세스당 하나만 만들어 연결 풀과 요청 한도를 모든 세션이 함께 씁니다
+@st.cache_resource
+def get_llm(api_key):
+    client = create_client(api_key, pool_size=int(os.environ.get("OPENAI_POOL_SIZE", "20")))
+    limiter = TokenBucketLimiter(requests_per_minute=int(os.environ.get("OPENAI_RPM", "500")),
+                                 tokens_per_minute=int(os.environ.get("OPENAI_TPM", "30000")))
+    return ResilientLLM(client, limiter=limiter, telemetry=telemetry, deadline=LLM_DEADLINE_SECONDS)
+
+# 동시에 들어온 같은 추천 요청을 하나의 업스트림 호출로 합칩니다
+@st.cache_resource
+def get_recommendation_flights():
+    return SingleFlight()
+
+recommendation_flights = get_recommendation_flights()
 
 # OpenAI API 키 설정
 try:
@@ -9,7 +62,7 @@ try:
     if not api_key:
         st.error("OpenAI API 키가 설정되지 않았습니다. Streamlit Cloud의 Secrets 설정에서 API 키를 추가해주세요.")
         st.stop()
-    client = OpenAI(api_key=api_key)
+    llm = get_llm(api_key)
 except Exception as e:
     st.error(f"OpenAI API 키 설정 중 오류가 발생했습니다: {str(e)}")
     st.error("Streamlit Cloud의 Secrets 설정에서 API 키를 확인해주세요.")
@@ -65,14 +118,27 @@ st.markdown("""
     .stSidebar > div:first-child {
         background-color: #FFFBEB; /* 카드와 유사한 배경 */
     }
-    .stButton>button {
+    .card h3 {
+        margin-top: 0;
+    }
+    .card-caption {
+        color: #78716C;
+        font-size: 0.9rem;
+    }
+    .card-meta {
+        display: grid;
+        grid-template-columns: repeat(3, 1fr);
+        gap: 0.5rem;
+        margin-bottom: 0.75rem;
+    }
+    .stButton>button, .stFormSubmitButton>button {
         background-color: #D97706;
         color: white;
         border-radius: 0.5rem;
         padding: 0.75rem 1.5rem;
         border: none;
     }
-    .stButton>button:hover {
+    .stButton>button:hover, .stFormSubmitButton>button:hover {
         background-color: #B45309;
         color: white;
     }
@@ -99,38 +165,173 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# 추천 결과 캐시 (프로세스 내 LRU + precompute.py 결과 + 워커 간 공유 SQLite)
+@st.cache_resource
+def get_recommendation_cache():
+    precomputed_path = os.environ.get("RECOMMEND_PRECOMPUTED_PATH", ".cache/precomputed.sqlite3")
+    precomputed = PrecomputedStore(precomputed_path) if os.path.exists(precomputed_path) else None
+    cache = RecommendationCache(os.environ.get("RECOMMEND_CACHE_PATH", ".cache/recommendations.sqlite3"),
+                                precomputed=precomputed)
+    # 지난달 이전에 만료된 항목은 시작할 때 지웁니다
+    cache.purge_expired()
+    return cache
+
+recommendation_cache = get_recommendation_cache()
+
+# 추천 방식: generate(LLM이 연수 생성) / rerank(카탈로그 후보를 LLM이 골라 설명) / catalog(LLM 없이 카탈로그 검색만)
+RECOMMEND_MODE = os.environ.get("RECOMMEND_MODE", "generate")
+CATALOG_PATH = os.environ.get("RECOMMEND_CATALOG_PATH")
+RERANK_CANDIDATES = 10
+RECOMMENDATION_COUNT = 3
+
+# 카탈로그 파일이 바뀌면 version이 달라져 인덱스를 새로 만들고, 재정렬 결과 캐시도 새 키를 씁니다
+# (이전 버전의 인덱스는 메모리에 남기지 않습니다)
+@st.cache_resource(max_entries=1)
+def get_catalog_index(path, version):
+    return CatalogIndex(load_catalog(path))
+
+catalog_version_id = catalog_version(CATALOG_PATH) if CATALOG_PATH else None
+catalog_index = get_catalog_index(CATALOG_PATH, catalog_version_id) if CATALOG_PATH else None
+if catalog_index is None:
+    RECOMMEND_MODE = "generate"
+
+def recommendation_key(profile):
+    if RECOMMEND_MODE == "generate":
+        return profile.key()
+    return f"{profile.key()}:{RECOMMEND_MODE}:{catalog_version_id}"
+
+def build_prompt(profile):
+    """(프롬프트, 재정렬 후보)를 돌려줍니다. 후보는 rerank 방식에서만 있습니다."""
+    with telemetry.span("recommend_prompt_build", mode=RECOMMEND_MODE):
+        if RECOMMEND_MODE == "rerank":
+            candidates = search_profile(catalog_index, profile, k=RERANK_CANDIDATES)
+            return build_rerank_prompt(profile, format_candidates(candidates)), candidates
+        return build_recommendation_prompt(profile), None
+
+def produce_recommendations(profile, prompt, candidates, session_id, publish):
+    if candidates is None:
+        return stream_recommendations(llm, prompt, publish, session_id=session_id)
+    # 재정렬 결과는 후보 목록의 카탈로그 항목으로 되돌리고, 후보에 없는(지어낸) 연수는 버립니다
+    matched = []
+    def publish_matched(course):
+        course = match_candidate(course, candidates)
+        if course is None or any(course["title"] == kept["title"] for kept in matched):
+            telemetry.incr("rerank_dropped_total")
+            return
+        matched.append(course)
+        publish(course)
+    stream_recommendations(llm, prompt, publish_matched, session_id=session_id)
+    # 버린 만큼은 LLM이 고르지 않은 후보 중 검색 순위가 높은 것으로 채웁니다
+    for candidate, _ in candidates:
+        if len(matched) >= RECOMMENDATION_COUNT:
+            break
+        if any(candidate.get("title") == kept["title"] for kept in matched):
+            continue
+        course = catalog_course_card(candidate, profile)
+        matched.append(course)
+        publish(course)
+    return matched
+
+def fetch_recommendations(profile, cache_key, session_id, on_course=None):
+    # Streamlit 요소를 쓰지 않으므로 미리 요청하는 백그라운드 스레드에서도 부를 수 있습니다
+    prompt, candidates = build_prompt(profile)
+
+    def produce(publish):
+        # 앞선 호출이 방금 끝나 캐시에 넣은 뒤에 선두가 되었으면 다시 호출하지 않습니다
+        cached = recommendation_cache.get(cache_key)
+        if cached is not None:
+            for course in cached:
+                publish(course)
+            return cached
+        courses = produce_recommendations(profile, prompt, candidates, session_id, publish)
+        # 선두가 받자마자 저장하므로 선두 세션이 도중에 다시 실행되어도 결과는 캐시에 남습니다
+        # 3개를 채우지 못한 결과는 한 달 내내 남지 않도록 저장하지 않습니다
+        if len(courses) >= RECOMMENDATION_COUNT:
+            recommendation_cache.set(cache_key, courses, profile.month)
+        return courses
+
+    # 같은 프롬프트의 요청이 이미 진행 중이면 새로 호출하지 않고 그 결과를 함께 받습니다
+    with telemetry.span("recommend_llm"):
+        return recommendation_flights.run_streaming(prompt_key(prompt), produce, on_item=on_course,
+                                                    timeout=LLM_DEADLINE_SECONDS)
+
+# 프로필 입력 중 추천 미리 요청 (RECOMMEND_PREFETCH=1일 때만, 카탈로그 검색만 쓰는 방식에서는 필요 없음)
+PREFETCH_ENABLED = os.environ.get("RECOMMEND_PREFETCH", "0") == "1" and RECOMMEND_MODE != "catalog"
+
+@st.cache_resource
+def get_prefetcher():
+    return Prefetcher(max_workers=int(os.environ.get("RECOMMEND_PREFETCH_WORKERS", "4")),
+                      debounce=float(os.environ.get("RECOMMEND_PREFETCH_DEBOUNCE", "1.5")),
+                      per_session_limit=int(os.environ.get("RECOMMEND_PREFETCH_LIMIT", "3")),
+                      telemetry=telemetry)
+
+prefetcher = get_prefetcher() if PREFETCH_ENABLED else None
+
+# 상담 답변 캐시 (비슷한 질문에 했던 답변을 LLM 호출 없이 재사용, CHAT_CACHE_ENABLED=0이면 끔)
+@st.cache_resource
+def get_answer_cache():
+    return AnswerCache(os.environ.get("CHAT_CACHE_PATH", ".cache/answers.sqlite3"),
+                       threshold=float(os.environ.get("CHAT_CACHE_THRESHOLD", "0.92")))
+
+answer_cache = get_answer_cache() if os.environ.get("CHAT_CACHE_ENABLED", "1") == "1" else None
+
+# 세션별 상담 기록/추천 결과 저장소 (최근 대화만 메모리에 두고 나머지는 SQLite)
+@st.cache_resource
+def get_session_store():
+    store = SessionStore(os.environ.get("SESSION_STORE_PATH", ".cache/sessions.sqlite3"),
+                         ttl_days=int(os.environ.get("SESSION_TTL_DAYS", "30")))
+    store.purge_expired()
+    return store
+
+session_store = get_session_store()
+CHAT_RENDER_LIMIT = int(os.environ.get("CHAT_RENDER_LIMIT", "20"))
+# 챗봇 답변 길이 상한 (요청 한도도 이 값으로 미리 잡습니다)
+CHAT_MAX_TOKENS = 800
+
+def save_session():
+    session_store.save_state(st.session_state.session_id, {
+        "teacher_profile": st.session_state.teacher_profile,
+        "recommended_courses": st.session_state.recommended_courses,
+        "recommendations_made": st.session_state.recommendations_made,
+        "chat_context": st.session_state.chat_context.state(),
+    })
+
+def render_course_card(i, course):
+    st.markdown(course_card_html(i, course), unsafe_allow_html=True)
+
 # 앱 제목 설정
 st.markdown("<h1 class='main-header'>교사 맞춤형 연수 추천 👩‍🏫</h1>", unsafe_allow_html=True)
 st.markdown("선생님의 성장 여정에 따뜻한 등불이 될 연수를 찾아드릴게요.")
 
-# 세션 상태 초기화
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
-if 'recommendations_made' not in st.session_state:
-    st.session_state.recommendations_made = False
-if 'recommended_courses' not in st.session_state:
-    st.session_state.recommended_courses = []
-
-# 사이드바 구성
-with st.sidebar:
-    st.header("🔍 프로필 설정")
-
+# 세션 상태 초기화 - 새로고침해도 이어지도록 세션 id를 URL에 두고 저장된 대화와 추천 결과를 불러옵니다
+if 'session_id' not in st.session_state:
+    session_id = st.query_params.get("sid", "")
+    if not re.fullmatch(r"[0-9a-f]{32}", session_id):
+        session_id = uuid.uuid4().hex
+        st.query_params["sid"] = session_id
+    st.session_state.session_id = session_id
+    saved = session_store.load_state(session_id) or {}
+    st.session_state.teacher_profile = saved.get("teacher_profile", {})
+    st.session_state.recommended_courses = saved.get("recommended_courses", [])
+    st.session_state.recommendations_made = saved.get("recommendations_made", False)
+    st.session_state.chat_context = ChatContext()
+    st.session_state.chat_context.restore(saved.get("chat_context", {}))
+    st.session_state.chat_history = ChatHistory(session_store, session_id, window=max(CHAT_RENDER_LIMIT, 24))
+if 'chat_visible' not in st.session_state:
+    st.session_state.chat_visible = CHAT_RENDER_LIMIT
+if 'recommendation_pending' not in st.session_state:
+    st.session_state.recommendation_pending = False
+
+def profile_inputs():
     teacher_name = st.text_input("이름 (선택사항)")
     teaching_experience = st.slider("교직 경력 (년)", 0, 40, 5)
-    school_level = st.selectbox("학교급", ["초등학교", "중학교", "고등학교", "특수학교", "기타"])
+    school_level = st.selectbox("학교급", SCHOOL_LEVELS)
     subject = st.text_input("담당 과목 (구체적으로, 예: 중학교 2학년 수학)")
 
     st.subheader("💡 관심 분야 (복수 선택 가능)")
-    categories = {
-        "교수학습 혁신": ["AI 기반 맞춤형 교육", "프로젝트 기반 학습(PBL)", "하브루타/토론 수업", "게이미피케이션 활용", "학습자 주도성 신장"],
-        "디지털 역량 강화": ["디지털 시민성 교육", "AI 리터러시 및 윤리", "코딩/SW 교육 심화", "데이터 기반 학습 분석", "메타버스 교육 활용"],
-        "학생 성장 지원": ["정서행동 위기학생 지원", "회복적 생활교육", "학부모 상담 전문성", "진로 설계 및 코칭", "다문화 학생 이해"],
-        "미래 교육 대비": ["기후위기/환경생태 교육", "미래사회 변화와 교육", "에듀테크 동향 및 활용", "교육과정 디자인", "IB 프로그램 이해"],
-        "교사 전문성 신장": ["교육 연구 방법론", "전문적 학습공동체 운영", "교사 리더십 개발", "교사 소진 예방 및 힐링", "교육 정책 이해"]
-    }
 
     selected_interests = []
-    for category, options in categories.items():
+    for category, options in CATEGORIES.items():
         expander = st.expander(f"**{category}**")
         with expander:
             for option in options:
@@ -139,190 +340,282 @@ with st.sidebar:
 
     st.markdown("---")
 
-    preference = st.radio("선호 연수 형태", ["온라인", "오프라인", "혼합형", "실시간 온라인", "비실시간 온라인"], horizontal=True)
-    time_preference = st.multiselect("선호 연수 시간", ["평일 오전", "평일 오후", "평일 저녁", "주말", "방학 중 집중"])
-
-    recommend_btn = st.button("✨ 맞춤 연수 추천받기")
-
-# 메인 영역 레이아웃
-col1, col2 = st.columns([3, 2]) # 추천 영역을 조금 더 넓게
-
-# 연수 추천 영역
-with col1:
-    if recommend_btn and selected_interests:
-        st.markdown("<h2 class='sub-header'>선생님을 위한 맞춤 연수 제안</h2>", unsafe_allow_html=True)
+    preference = st.radio("선호 연수 형태", PREFERENCES, horizontal=True)
+    time_preference = st.multiselect("선호 연수 시간", TIME_PREFERENCES)
+
+    return {
+        "name": teacher_name,
+        "experience": teaching_experience,
+        "school_level": school_level,
+        "subject": subject,
+        "interests": selected_interests,
+        "preference": preference,
+        "time_preference": time_preference,
+    }
 
-        with st.spinner("⏳ 선생님의 성장을 위한 최적의 연수를 찾고 있어요..."):
-            current_date = datetime.now().strftime("%Y년 %m월")
-            prompt = f"""
-            당신은 대한민국 교육 현장에 대한 이해가 깊고, 교사들의 전문성 개발을 돕는 데 열정적인 교육 컨설턴트입니다.
-            다음은 연수 추천을 요청한 교사의 정보입니다:
-
-            - 이름: {teacher_name if teacher_name else "익명"}
-            - 교직 경력: {teaching_experience}년차
-            - 학교급: {school_level}
-            - 담당 과목/학년: {subject if subject else "미입력"}
-            - 주요 관심 분야: {', '.join(selected_interests)}
-            - 선호 연수 형태: {preference}
-            - 선호 연수 시간: {', '.join(time_preference) if time_preference else "미입력"}
-            - 현재 시점: {current_date}
-
-            **요청사항:**
-            위 교사의 정보(특히 경력, 학교급, 담당과목, 관심분야)를 면밀히 분석하여, 실제 교육 현장에서 즉시 적용 가능하고 교사의 전문성 성장에 실질적인 도움을 줄 수 있는 연수 3가지를 추천해주세요.
-            추천 시 다음 사항을 반드시 고려하고, 결과는 아래 지정된 JSON 형식으로만 답변해주세요. 다른 설명은 절대 추가하지 마세요.
-
-            **고려사항:**
-            1.  **실질적 도움:** 연수 내용이 교사의 현재 담당 업무나 관심 분야와 어떻게 직접적으로 연결되는지, 어떤 교육적 효과를 기대할 수 있는지 명확히 제시해야 합니다.
-            2.  **현장 적용성:** 배운 내용을 교실 수업, 학생 지도, 동료 교사와의 협업 등에 구체적으로 어떻게 적용할 수 있는지 실용적인 팁이나 아이디어를 포함해야 합니다.
-            3.  **성장 단계 고려:** 교사의 경력(저경력/중견/고경력)과 학교급에 맞는 연수 내용과 깊이를 고려하여 추천해야 합니다. 예를 들어, 저경력 교사에게는 기본적인 교수법이나 학급 운영 연수가, 고경력 교사에게는 연구나 리더십 관련 연수가 더 적합할 수 있습니다.
-            4.  **최신 동향 반영:** AI 교육, 디지털 전환, 기후위기 등 최신 교육 트렌드와 정책 방향을 반영한 연수를 우선적으로 고려해주세요 (교사의 관심사와 부합할 경우).
-            5.  **구체적인 연수명:** 실제 교육청, 연수원, 대학 등에서 운영할 법한 현실적이고 구체적인 연수 제목을 사용해주세요. (예: "AI 디지털 교과서 활용 수업 디자인 실습", "PBL 기반 학생 참여형 수업 전문가 과정")
-
-            **JSON 출력 형식:**
-            {{
-                "recommended_courses": [
-                    {{
-                        "title": "구체적인 연수 제목",
-                        "category": "연수 카테고리 (예: 교수학습 혁신, 디지털 역량)",
-                        "target_audience": "{school_level} {subject if subject else ''} 교사, {teaching_experience}년차 내외 교사 등 구체적 대상 명시",
-                        "format": "{preference} 또는 추천 형태 (예: 온라인, 혼합형)",
-                        "duration": "연수 기간 (예: 3일, 15시간)",
-                        "credits": "이수 학점 (예: 1학점)",
-                        "description": "연수의 핵심 내용을 요약 설명",
-                        "benefits": "이 연수를 통해 교사가 얻을 수 있는 구체적인 성장 지점이나 교육적 효과",
-                        "recommendation_reason": "이 교사의 프로필(경력, 관심사 등)과 연관지어 이 연수를 추천하는 구체적인 이유",
-                        "practical_application": "배운 내용을 학교 현장에서 실제 수업이나 학생 지도에 적용할 수 있는 구체적인 방법이나 아이디어 2-3가지"
-                    }},
-                    // ... (총 3개 추천)
-                ]
-            }}
-            """
+# 제출한 프로필은 세션 상태에 두고, 추천/챗봇 영역은 이 값만 보고 그립니다
+def submit_profile(teacher):
+    st.session_state.teacher_profile = teacher
+    st.session_state.recommendation_pending = bool(teacher["interests"])
+    st.session_state.interests_missing = not teacher["interests"]
+
+def prefetch_recommendations(teacher):
+    profile = normalize_profile(teacher["experience"], teacher["school_level"], teacher["subject"],
+                                teacher["interests"], teacher["preference"], teacher["time_preference"])
+    cache_key = recommendation_key(profile)
+    session_id = st.session_state.session_id
+    prefetcher.schedule(session_id, cache_key, lambda: fetch_recommendations(profile, cache_key, session_id),
+                        is_cached=recommendation_cache.contains)
+
+# 미리 요청 모드에서는 폼 대신 프래그먼트로 입력을 받아, 입력이 바뀔 때 사이드바만 다시 실행합니다
+@st.fragment
+def prefetch_profile_panel():
+    teacher = profile_inputs()
+    if teacher["interests"]:
+        prefetch_recommendations(teacher)
+    if st.button("✨ 맞춤 연수 추천받기"):
+        submit_profile(teacher)
+        st.rerun()
+
+# 사이드바 구성 (폼 안의 입력은 "추천받기"를 눌러 제출할 때만 재실행을 일으킵니다)
+with st.sidebar:
+    st.header("🔍 프로필 설정")
 
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-4o", # 최신 모델 사용 권장
-                    messages=[{"role": "system", "content": prompt}],
-                    response_format={ "type": "json_object" } # JSON 형식 지정
+    if PREFETCH_ENABLED:
+        prefetch_profile_panel()
+    else:
+        with st.form("profile_form", border=False):
+            teacher = profile_inputs()
+            if st.form_submit_button("✨ 맞춤 연수 추천받기"):
+                submit_profile(teacher)
+
+    if TELEMETRY_ADMIN:
+        with st.expander("📊 관리자 지표"):
+            cache_stats = recommendation_cache.stats()
+            st.caption(f"추천 캐시 적중 {cache_stats['memory_hits'] + cache_stats['precomputed_hits'] + cache_stats['disk_hits']}회 "
+                       f"(메모리 {cache_stats['memory_hits']} / 사전 계산 {cache_stats['precomputed_hits']} / 디스크 {cache_stats['disk_hits']}) · "
+                       f"미적중 {cache_stats['misses']}회 · 적중률 {cache_stats['hit_rate']:.0%}")
+            if answer_cache is not None:
+                answer_stats = answer_cache.stats()
+                st.caption(f"상담 답변 캐시 {answer_stats['entries']}건 · 적중 {answer_stats['hits']}회 / 미적중 {answer_stats['misses']}회 "
+                           f"(적중률 {answer_stats['hit_rate']:.0%}) · 캐시 제외 질문 {answer_stats['bypassed']}회")
+            if prefetcher is not None:
+                prefetch_stats = prefetcher.stats()
+                st.caption(f"미리 요청 {prefetch_stats['started']}회 · 사용 {prefetch_stats['hits']}회 "
+                           f"(적중률 {prefetch_stats['hit_rate']:.0%}) · 낭비 {prefetch_stats['wasted']}회 · "
+                           f"입력 변경으로 취소 {prefetch_stats['superseded']}회 · 한도 초과 {prefetch_stats['capped']}회")
+            if telemetry.enabled:
+                metrics = telemetry.summary()
+                st.dataframe(
+                    [{"단계": name, "횟수": v["count"], "p50(ms)": round(v["p50_ms"], 1), "p95(ms)": round(v["p95_ms"], 1)}
+                     for name, v in sorted(metrics["stages"].items())],
+                    hide_index=True,
                 )
-
-                recommendations_data = json.loads(response.choices[0].message.content)
-                st.session_state.recommended_courses = recommendations_data.get("recommended_courses", [])
-                st.session_state.recommendations_made = True
-
-                if not st.session_state.recommended_courses:
-                    st.warning("추천 연수를 생성하는 데 실패했습니다. 프로필 설정을 확인하고 다시 시도해주세요.")
-                else:
-                    for i, course in enumerate(st.session_state.recommended_courses):
-                        with st.container():
-                            st.markdown(f"<div class='card'>", unsafe_allow_html=True)
-                            st.markdown(f"### {i+1}. {course.get('title', '제목 없음')}")
-                            st.caption(f"🎯 추천 대상: {course.get('target_audience', '정보 없음')}")
-                            col_a, col_b, col_c = st.columns(3)
-                            with col_a:
-                                st.markdown(f"**카테고리:** {course.get('category', '-')}")
-                            with col_b:
-                                st.markdown(f"**형태:** {course.get('format', '-')}")
-                            with col_c:
-                                st.markdown(f"**학점:** {course.get('credits', '-')}")
-
-                            st.markdown(f"**📅 기간:** {course.get('duration', '-')}")
-                            st.markdown(f"**📝 내용:** {course.get('description', '-')}")
-                            st.markdown(f"<div class='highlight'>📈 기대 효과: {course.get('benefits', '-')}</div>",
-                                       unsafe_allow_html=True)
-                            st.markdown(f"**💡 추천 이유:** {course.get('recommendation_reason', '-')}")
-                            st.markdown(f"**🚀 현장 적용 Tip:** {course.get('practical_application', '-')}")
-                            st.markdown("</div>", unsafe_allow_html=True)
-
-            except json.JSONDecodeError:
-                 st.error("🤖 추천 결과를 분석하는 중 오류가 발생했습니다. 잠시 후 다시 시도해주세요.")
-                 st.session_state.recommendations_made = False
-            except Exception as e:
-                 st.error(f"🤖 오류가 발생했습니다: {str(e)}")
-                 st.error("다시 시도해주세요.")
-                 st.session_state.recommendations_made = False
-
-    elif recommend_btn and not selected_interests:
+                session_usage = metrics["sessions"].get(st.session_state.session_id)
+                if session_usage:
+                    st.caption(f"이 세션: 요청 {session_usage['requests']}회 · 입력 {session_usage['prompt_tokens']}토큰 "
+                               f"(캐시 {session_usage['cached_tokens']}) · 출력 {session_usage['completion_tokens']}토큰")
+                if metrics["sessions"]:
+                    totals = [u["prompt_tokens"] + u["completion_tokens"] for u in metrics["sessions"].values()]
+                    st.caption(f"세션 {len(totals)}개 · 세션당 평균 {sum(totals) / len(totals):.0f}토큰")
+                for name, value in sorted(metrics["counters"].items()):
+                    st.caption(f"{name}: {value:g}")
+            else:
+                st.caption("TELEMETRY_ENABLED=1로 실행하면 단계별 지연 시간과 토큰 사용량이 표시됩니다.")
+
+
+def request_recommendations(teacher):
+    profile = normalize_profile(teacher["experience"], teacher["school_level"], teacher["subject"],
+                                teacher["interests"], teacher["preference"], teacher["time_preference"])
+    cache_key = recommendation_key(profile)
+    if prefetcher is not None:
+        prefetcher.claim(st.session_state.session_id, cache_key)
+    if RECOMMEND_MODE == "catalog":
+        # LLM 없이 카탈로그 검색 결과를 그대로 보여줍니다
+        cached_courses = [catalog_course_card(course, profile) for course, _ in search_profile(catalog_index, profile, k=3)]
+    else:
+        cached_courses = recommendation_cache.get(cache_key)
+        telemetry.incr("cache_lookups_total", result="miss" if cached_courses is None else "hit")
+
+    try:
+        if cached_courses is not None:
+            # 같은 프로필로 이번 달에 이미 받은 추천은 API 호출 없이 바로 보여줍니다
+            st.session_state.recommended_courses = cached_courses
+        else:
+            # 스트리밍으로 받으면서 연수 객체가 하나 완성될 때마다 카드를 바로 그립니다
+            status = st.empty()
+            status.info("⏳ 선생님의 성장을 위한 최적의 연수를 찾고 있어요...")
+            shown = []
+            started = time.perf_counter()
+            def render_streamed_card(course):
+                if not shown:
+                    telemetry.observe("recommend_first_card", time.perf_counter() - started)
+                status.empty()
+                with telemetry.span("recommend_render"):
+                    render_course_card(len(shown), course)
+                shown.append(course)
+            st.session_state.recommended_courses = fetch_recommendations(
+                profile, cache_key, st.session_state.session_id, on_course=render_streamed_card)
+            status.empty()
+        st.session_state.recommendations_made = True
+
+        if not st.session_state.recommended_courses:
+            st.warning("추천 연수를 생성하는 데 실패했습니다. 프로필 설정을 확인하고 다시 시도해주세요.")
+        elif cached_courses is not None:
+            with telemetry.span("recommend_render"):
+                for i, course in enumerate(st.session_state.recommended_courses):
+                    render_course_card(i, course)
+
+    except json.JSONDecodeError:
+         st.error("🤖 추천 결과를 분석하는 중 오류가 발생했습니다. 잠시 후 다시 시도해주세요.")
+         st.session_state.recommendations_made = False
+    except (*UPSTREAM_ERRORS, FlightAbortedError, TimeoutError):
+         if catalog_index is not None:
+             # AI 응답이 불안정할 때는 카탈로그 검색 결과로 대신 보여줍니다
+             st.info("🤖 지금은 AI 응답이 원활하지 않아 연수 목록에서 찾은 결과를 먼저 보여드려요.")
+             st.session_state.recommended_courses = [catalog_course_card(course, profile) for course, _ in search_profile(catalog_index, profile, k=3)]
+             st.session_state.recommendations_made = bool(st.session_state.recommended_courses)
+             for i, course in enumerate(st.session_state.recommended_courses):
+                 render_course_card(i, course)
+         else:
+             st.error("🤖 지금은 추천 서비스 응답이 지연되고 있어요. 잠시 후 다시 시도해주세요.")
+             st.session_state.recommendations_made = False
+    except Exception as e:
+         st.error(f"🤖 오류가 발생했습니다: {str(e)}")
+         st.error("다시 시도해주세요.")
+         st.session_state.recommendations_made = False
+
+# 연수 추천 영역 - 결과는 세션 상태에서 다시 그리므로 다른 상호작용 뒤에도 사라지지 않습니다
+@st.fragment
+def recommendation_panel():
+    if st.session_state.recommendation_pending:
+        st.session_state.recommendation_pending = False
+        st.markdown("<h2 class='sub-header'>선생님을 위한 맞춤 연수 제안</h2>", unsafe_allow_html=True)
+        request_recommendations(st.session_state.teacher_profile)
+        save_session()
+    elif st.session_state.pop("interests_missing", False):
         st.warning("⚠️ 하나 이상의 관심 분야를 선택해주세요!")
+    elif st.session_state.recommended_courses:
+        st.markdown("<h2 class='sub-header'>선생님을 위한 맞춤 연수 제안</h2>", unsafe_allow_html=True)
+        for i, course in enumerate(st.session_state.recommended_courses):
+            render_course_card(i, course)
 
-# 챗봇 인터페이스
-with col2:
+# 챗봇 인터페이스 - 질문을 보내도 이 프래그먼트만 다시 실행됩니다
+@st.fragment
+def chat_panel():
     st.markdown("<h2 class='sub-header'>💬 연수 상담 챗봇</h2>", unsafe_allow_html=True)
     if not st.session_state.recommendations_made:
         st.info("먼저 프로필을 설정하고 연수 추천을 받아보세요. 추천 결과에 대해 궁금한 점을 질문할 수 있습니다.")
     else:
         st.success("연수 추천 결과에 대해 궁금한 점이나 추가 정보가 필요하시면 아래에 질문해주세요!")
 
-    # 채팅 이력 표시
+    # 채팅 이력 표시 - 최근 메시지만 그리고, 이전 대화는 요청할 때 저장소에서 불러옵니다
+    chat_history = st.session_state.chat_history
     chat_container = st.container(height=500) # 채팅 영역 높이 지정
     with chat_container:
-        for message in st.session_state.chat_history:
-            if message["role"] == "user":
-                st.markdown(f"<div class='user-message'><strong>나:</strong> {message['content']}</div>", unsafe_allow_html=True)
-            else:
-                st.markdown(f"<div class='assistant-message'><strong>챗봇:</strong> {message['content']}</div>", unsafe_allow_html=True)
+        hidden = len(chat_history) - st.session_state.chat_visible
+        if hidden > 0 and st.button(f"⬆️ 이전 대화 더 보기 ({hidden}개)", key="load_earlier_chat"):
+            st.session_state.chat_visible += CHAT_RENDER_LIMIT
+        for message in chat_history.tail(st.session_state.chat_visible):
+            st.markdown(message_html(message["role"], message["content"]), unsafe_allow_html=True)
 
     # 사용자 입력
     user_question = st.chat_input("연수에 대해 질문해보세요...") # chat_input 사용
 
     if user_question:
-        # 사용자 메시지 저장 및 표시
-        st.session_state.chat_history.append({"role": "user", "content": user_question})
+        # 사용자 메시지 표시 (기록에는 문맥을 만든 뒤 넣습니다)
         with chat_container:
-             st.markdown(f"<div class='user-message'><strong>나:</strong> {user_question}</div>", unsafe_allow_html=True)
-
-        # 챗봇 응답 생성
-        interests_text = ', '.join(selected_interests) if selected_interests else '미선택'
-        recommended_courses_summary = "\n".join([f"- {c.get('title', '')}: {c.get('description', '')}" for c in st.session_state.recommended_courses]) if st.session_state.recommended_courses else "아직 추천된 연수 없음"
-
-        chat_prompt = f"""
-        당신은 '따뜻한 연수 도우미' 챗봇입니다. 교사의 성장을 진심으로 응원하며, 친절하고 상세하게 답변해야 합니다.
-
-        **교사 정보:**
-        - 이름: {teacher_name if teacher_name else "익명"}
-        - 경력: {teaching_experience}년차
-        - 학교급: {school_level}
-        - 담당: {subject if subject else "미입력"}
-        - 관심 분야: {interests_text}
-        - 선호 형태/시간: {preference} / {', '.join(time_preference) if time_preference else "미입력"}
-
-        **현재 추천된 연수 목록 (참고용):**
-        {recommended_courses_summary}
-
-        **챗봇의 역할:**
-        1.  교사의 질문 의도를 파악하고, 위 교사 정보와 추천된 연수 목록을 바탕으로 **매우 구체적이고 실용적인 답변**을 제공합니다.
-        2.  추천된 연수에 대한 **심층 질문**(예: 특정 연수의 실제 후기, 유사 연수 비교, 연수 내용의 현장 적용 방안 심화)에 상세히 답변합니다.
-        3.  추천 목록 외에 **새로운 연수 정보를 질문**하면, 교사의 프로필에 맞춰 관련성 높은 정보를 탐색하여 안내합니다 (실제 검색 기능은 없으므로, 그럴듯한 정보를 생성).
-        4.  연수 이수 후의 **성장 경로**나 **역량 개발**에 대한 조언을 제공합니다.
-        5.  **따뜻하고 공감하는 어조**를 사용하며, 교사의 노고를 격려하는 메시지를 포함합니다.
-        6.  답변은 명확하고 이해하기 쉽게, 필요시 **불렛 포인트나 단계별 설명**을 활용합니다.
-        7.  정보가 부족하거나 확실하지 않을 때는 솔직하게 인정하고, 추가 정보를 찾을 수 있는 방법을 안내합니다.
-
-        **교사의 질문:** {user_question}
-
-        **답변:**
-        """
-
-        try:
-            with st.spinner("답변을 생각하고 있어요..."):
-                chat_response = client.chat.completions.create(
+             st.markdown(message_html("user", user_question), unsafe_allow_html=True)
+
+        # 학교급/경력 구간이 같은 교사가 했던 비슷한 질문이면 저장된 답변을 그대로 보여줍니다
+        teacher = st.session_state.teacher_profile
+        course_titles = [course.get("title", "") for course in st.session_state.recommended_courses]
+        answer_context = context_key(teacher.get("school_level"), experience_bucket(teacher.get("experience", 0)),
+                                     interest_categories(teacher.get("interests", [])), teacher.get("preference", ""))
+        cached_answer, similarity = (None, None) if answer_cache is None else answer_cache.lookup(
+            user_question, answer_context, course_titles)
+        if similarity is not None:
+            telemetry.incr("chat_answer_cache_total", result="miss" if cached_answer is None else "hit")
+
+        if cached_answer is not None:
+            chat_history.append({"role": "user", "content": user_question})
+            chat_history.append({"role": "assistant", "content": cached_answer})
+            with chat_container:
+                st.markdown(message_html("assistant", cached_answer), unsafe_allow_html=True)
+            st.caption(f"💾 비슷한 질문에 드렸던 답변이에요 (유사도 {similarity:.2f})")
+        else:
+            # 챗봇 응답 생성 - 고정 프롬프트 + 요약 + 토큰 예산 안의 최근 대화
+            chat_context = st.session_state.chat_context
+            with telemetry.span("chat_prompt_build"):
+                chat_messages = chat_context.build_messages(
+                    build_chat_system_prompt(teacher, st.session_state.recommended_courses),
+                    chat_history,
+                    user_question,
+                )
+            chat_history.append({"role": "user", "content": user_question})
+            usage = {}
+
+            try:
+                with chat_container:
+                    answer_placeholder = st.empty()
+                answer_placeholder.markdown(message_html("assistant", "답변을 생각하고 있어요..."), unsafe_allow_html=True)
+                started = time.perf_counter()
+                chat_stream = llm.create(
                     model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": chat_prompt},
-                        # 이전 대화 내용을 포함시켜 문맥 유지 (선택 사항)
-                        # *[{"role": msg["role"], "content": msg["content"]} for msg in st.session_state.chat_history[-5:]], # 최근 5개 대화
-                        {"role": "user", "content": user_question}
-                    ]
+                    messages=chat_messages,
+                    max_tokens=CHAT_MAX_TOKENS,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    session_id=st.session_state.session_id
                 )
-                assistant_response = chat_response.choices[0].message.content
+                # 토큰이 도착하는 대로 말풍선을 갱신합니다
+                assistant_response = ""
+                first_token_at = None
+                for text in iter_stream_text(chat_stream, on_usage=lambda u: usage.update(zip(("prompt", "completion", "cached"), usage_tokens(u)))):
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        telemetry.observe("chat_first_token", first_token_at - started)
+                    assistant_response += text
+                    answer_placeholder.markdown(f"<div class='assistant-message'><strong>챗봇:</strong> {assistant_response}▌</div>", unsafe_allow_html=True)
 
                 # 챗봇 응답 저장 및 표시
-                st.session_state.chat_history.append({"role": "assistant", "content": assistant_response})
-                with chat_container:
-                    st.markdown(f"<div class='assistant-message'><strong>챗봇:</strong> {assistant_response}</div>", unsafe_allow_html=True)
+                chat_history.append({"role": "assistant", "content": assistant_response})
+                answer_placeholder.markdown(message_html("assistant", assistant_response), unsafe_allow_html=True)
+                if similarity is not None and assistant_response:
+                    # 이름/담당 과목/추천 연수명이 들어간 답변은 다른 교사에게 보여주지 않도록 저장하지 않습니다
+                    answer_cache.store(user_question, answer_context, assistant_response,
+                                       private_terms=[teacher.get("name"), teacher.get("subject"), *course_titles])
+                telemetry.observe("chat_llm", time.perf_counter() - started)
                 # 입력 필드 초기화를 위해 rerun 대신 chat_input 자체 기능 활용
 
-        except Exception as e:
-            st.error(f"🤖 답변 생성 중 오류가 발생했습니다: {str(e)}")
+                if usage:
+                    telemetry.record_usage(st.session_state.session_id, "gpt-4o", usage["prompt"], usage["completion"], usage["cached"])
+                    ttft = (first_token_at or time.perf_counter()) - started
+                    st.caption(f"🧮 입력 {usage['prompt']}토큰 (캐시 {usage['cached']}) · 출력 {usage['completion']}토큰 · "
+                               f"첫 응답 {ttft:.1f}초")
+
+                # 예산 밖으로 밀려난 대화가 쌓이면 요약에 합칩니다 (몇 턴에 한 번만 실행)
+                if chat_context.needs_summary(chat_history):
+                    try:
+                        chat_context.summarize(llm, chat_history, session_id=st.session_state.session_id)
+                    except UPSTREAM_ERRORS:
+                        pass  # 요약은 다음 턴에 다시 시도합니다
+
+            except (CircuitOpenError, DeadlineExceededError, StreamInterruptedError):
+                answer_placeholder.empty()
+                st.warning("🤖 지금은 답변 서비스가 혼잡해요. 잠시 후 다시 질문해주세요.")
+            except Exception as e:
+                st.error(f"🤖 답변 생성 중 오류가 발생했습니다: {str(e)}")
+        save_session()
+
+# 메인 영역 레이아웃
+col1, col2 = st.columns([3, 2]) # 추천 영역을 조금 더 넓게
+
+with col1:
+    recommendation_panel()
+
+with col2:
+    chat_panel()
 
 # 푸터
 st.markdown("---")
@@ -331,3 +624,5 @@ st.markdown("""
     © 2025 교사 맞춤형 연수 추천 시스템 | ♥️선생님의 빛나는 성장을 응원합니다 ✨ Made by 김문정
 </div>
 """, unsafe_allow_html=True)
+
+telemetry.observe("script_run", time.perf_counter() - script_started)
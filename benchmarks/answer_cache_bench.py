@@ -0,0 +1,57 @@
+"""상담 답변 캐시 검색 벤치마크.
+
+    python -m benchmarks.answer_cache_bench --size 100000 --queries 200
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from answer_cache import AnswerCache, context_key
+from recommender import CATEGORIES, EXPERIENCE_BUCKETS, PREFERENCES, SCHOOL_LEVELS
+
+TEMPLATES = ["{} 연수 학점은 어떻게 인정되나요?", "{} 연수는 방학 중에도 있나요?", "{} 관련 원격 연수 추천해 주세요",
+             "{} 연수 신청은 언제까지인가요?", "{} 연수를 들으면 수업에 바로 쓸 수 있나요?", "{} 심화 과정도 있나요?"]
+
+
+def synthetic_questions(size, contexts=0, seed=0):
+    rng = random.Random(seed)
+    options = [option for values in CATEGORIES.values() for option in values]
+    contexts = [context_key(level, bucket[2], (category,), preference) for level in SCHOOL_LEVELS
+                for bucket in EXPERIENCE_BUCKETS for category in CATEGORIES for preference in PREFERENCES][:contexts or None]
+    return [(f"{rng.choice(TEMPLATES).format(rng.choice(options))} ({i})", rng.choice(contexts)) for i in range(size)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="답변 캐시 검색 벤치마크")
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--contexts", type=int, default=0, help="질문을 나눌 context 수 (0이면 학교급 x 경력 구간 x 관심 분류 x 연수 형태 전부)")
+    args = parser.parse_args(argv)
+
+    questions = synthetic_questions(args.size, args.contexts)
+    cache = AnswerCache(capacity=args.size, dim=args.dim)
+    started = time.perf_counter()
+    for question, context in questions:
+        cache.store(question, context, "답변")
+    print(f"저장: {len(cache)}건, {time.perf_counter() - started:.2f}초, "
+          f"벡터 {cache.stats()['vector_bytes'] / 1e6:.0f}MB")
+
+    rng = random.Random(1)
+    timings = []
+    hits = 0
+    for _ in range(args.queries):
+        question, context = rng.choice(questions)
+        started = time.perf_counter()
+        answer, _ = cache.lookup(question, context)
+        timings.append((time.perf_counter() - started) * 1000)
+        hits += answer is not None
+    timings = np.asarray(timings)
+    print(f"검색 {args.queries}회 (적중 {hits}회): p50 {np.percentile(timings, 50):.2f}ms, "
+          f"p95 {np.percentile(timings, 95):.2f}ms, 최대 {timings.max():.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
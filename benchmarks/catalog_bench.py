@@ -0,0 +1,65 @@
+"""카탈로그 검색 인덱스 벤치마크.
+
+    python -m benchmarks.catalog_bench --size 100000 --queries 200
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from catalog import CatalogIndex, search_profile
+from recommender import CATEGORIES, PREFERENCES, SCHOOL_LEVELS, TIME_PREFERENCES, normalize_profile
+
+SUFFIXES = ["기초 과정", "심화 과정", "실습 워크숍", "전문가 과정", "수업 디자인", "사례 연구", "직무 연수", "컨설팅 캠프"]
+
+
+def synthetic_catalog(size, seed=0):
+    rng = random.Random(seed)
+    options = [(category, option) for category, values in CATEGORIES.items() for option in values]
+    courses = []
+    for i in range(size):
+        category, option = rng.choice(options)
+        _, other = rng.choice(options)
+        courses.append({
+            "title": f"{option} {rng.choice(SUFFIXES)} {i}",
+            "category": category,
+            "format": rng.choice(PREFERENCES),
+            "credits": f"{rng.randint(1, 4)}학점",
+            "duration": f"{rng.choice([15, 30, 45, 60])}시간",
+            "target_level": rng.sample(SCHOOL_LEVELS, rng.randint(1, 3)),
+            "schedule": rng.sample(TIME_PREFERENCES, rng.randint(1, 2)),
+            "description": f"{option}과 {other}를 연계한 현장 중심 연수",
+        })
+    return courses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="카탈로그 검색 벤치마크")
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    courses = synthetic_catalog(args.size)
+    started = time.perf_counter()
+    index = CatalogIndex(courses)
+    print(f"인덱스 생성: {len(index)}건, 어휘 {len(index.vocabulary)}개, {time.perf_counter() - started:.2f}초")
+
+    rng = random.Random(1)
+    interests = [option for values in CATEGORIES.values() for option in values]
+    timings = []
+    for _ in range(args.queries):
+        profile = normalize_profile(rng.randint(0, 40), rng.choice(SCHOOL_LEVELS), "",
+                                    rng.sample(interests, rng.randint(1, 3)), rng.choice(PREFERENCES),
+                                    rng.sample(TIME_PREFERENCES, rng.randint(0, 2)))
+        started = time.perf_counter()
+        search_profile(index, profile, k=args.k)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings = np.asarray(timings)
+    print(f"검색 {args.queries}회: p50 {np.percentile(timings, 50):.2f}ms, "
+          f"p95 {np.percentile(timings, 95):.2f}ms, 최대 {timings.max():.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
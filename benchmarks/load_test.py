@@ -0,0 +1,237 @@
+"""app.py 부하 테스트 (Streamlit AppTest + 가짜 OpenAI 서버).
+
+여러 세션을 동시에 흉내 내며(프로필 입력 → 추천 → 채팅) 아래 값을 모으고, 저장된 기준값과 비교합니다.
+세션은 --concurrency개 스레드에서 AppTest로 함께 실행되므로 요청 한도와 요청 합치기(single-flight)도
+실제처럼 동시에 부하를 받습니다. --profiles로 프로필 가짓수를 줄이면 같은 프로필의 세션이 겹칩니다.
+- 상호작용별 서버 실행 시간 p50/p95
+- 추천 요청을 누른 뒤 카드가 모두 그려질 때까지의 시간 p50/p95 (재시도 포함, "추천 요청" 행)
+- 세션당 메모리 (tracemalloc으로 따로 몇 세션만 측정해 시간 측정에 섞이지 않게 합니다)
+- 세션당 업스트림 호출 수, 추천 결과별 세션 수 (LLM / 카탈로그 대체 / 실패)
+
+    python -m benchmarks.load_test --sessions 20 --concurrency 8 --latency 0.05 --chunk-delay 0.005
+    python -m benchmarks.load_test --sessions 20 --profiles 4   # 같은 프로필이 동시에 몰리는 경우
+    python -m benchmarks.load_test --rate-limit-rate 0.1 --server-error-rate 0.05 --malformed-rate 0.1
+    python -m benchmarks.load_test --update-baseline
+
+기준값보다 허용 범위 이상 나빠진 지표가 있으면 목록을 출력하고 종료 코드 1로 끝납니다.
+시나리오(세션 수, 동시 실행 수, 가짜 서버 설정 등)가 기준값과 다르면 비교하지 않고 종료 코드 2로 끝납니다.
+기준값은 장비에 따라 달라지므로 CI 장비에서 --update-baseline으로 다시 만들어 두세요.
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.rerun_bench import run_session
+from fake_openai import FAKE_COURSES, FakeOpenAIServer
+from telemetry import percentile
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+SUBJECTS = ["국어", "수학", "영어", "과학", "사회", "음악", "미술", "체육", "정보", "도덕"]
+SCENARIO_KEYS = ("sessions", "turns", "concurrency", "profiles", "latency", "chunk_size", "chunk_delay", "rate_limit_rate",
+                 "server_error_rate", "malformed_rate", "seed")
+# 작은 값의 흔들림으로 실패하지 않도록 지표 종류별로 허용하는 최소 차이
+ABSOLUTE_SLACK = {"_ms": 5.0, "_kb": 64.0, "_per_session": 0.0, "_sessions": 0.0}
+
+
+def recommendation_outcome(at):
+    if not at.session_state["recommendations_made"]:
+        return "failed"
+    titles = {course["title"] for course in FAKE_COURSES}
+    if all(course.get("title") in titles for course in at.session_state["recommended_courses"]):
+        return "llm"
+    return "fallback"
+
+
+def session_subject(index, profiles=0):
+    # 세션마다 프로필이 달라야 추천 캐시에 걸리지 않고 매번 업스트림까지 갑니다 (profiles개로 나누면 겹침)
+    if profiles:
+        index %= profiles
+    return f"{SUBJECTS[index % len(SUBJECTS)]} {index}반"
+
+
+def use_secrets_file(workdir, api_key="test"):
+    # AppTest.secrets는 실행할 때마다 전역 st.secrets를 바꿔 끼우므로 세션을 동시에 실행하면 서로 덮어씁니다
+    # 대신 모든 세션이 임시 secrets.toml 하나를 함께 읽게 합니다
+    from streamlit import config
+
+    path = os.path.join(workdir, "secrets.toml")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'OPENAI_API_KEY = "{api_key}"\n')
+    config.set_option("secrets.files", [path])
+
+
+def allow_concurrent_apptests(app_path):
+    # AppTest는 한 번에 하나씩 실행된다고 보고 실행할 때마다 전역 상태를 바꿨다 되돌립니다.
+    # 여러 스레드에서 함께 실행해도 서로의 상태를 지우지 않도록 세 곳을 고정합니다.
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    # 1) 끝난 실행이 Runtime._instance를 None으로 돌려도 다른 실행은 마지막 런타임을 계속 씁니다
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+        if "runtime" not in last:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last["runtime"]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "runtime" in last)
+    # 2) 스크립트를 미리 한 번만 컴파일해 함께 씁니다 (3.11의 ast는 여러 스레드에서 동시에 파싱하면 깨질 수 있음)
+    shared_cache = ScriptCache()
+    shared_cache.get_bytecode(os.path.abspath(app_path))
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: shared_cache
+    # 3) 실행마다 켰다 끄는 테스트 모드 설정을 계속 켜 둡니다
+    config.set_option("global.appTest", True)
+
+
+def run_sessions(app_path, sessions, turns, concurrency, profiles, timings):
+    def one(index):
+        at = run_session(app_path, turns, timings, session_subject(index, profiles), api_key=None)
+        return recommendation_outcome(at)
+
+    outcomes = {}
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="session") as pool:
+        for outcome in pool.map(one, range(sessions)):
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return outcomes
+
+
+def measure_memory(app_path, turns, sessions, offset):
+    # 세션을 살려 둔 채로 늘어난 메모리를 세션 수로 나눕니다 (AppTest 자체의 요소 트리도 포함되는 상한값)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        alive = [run_session(app_path, turns, {}, session_subject(offset + i), api_key=None) for i in range(sessions)]
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del alive
+    return (after - before) / sessions / 1024
+
+
+def collect_metrics(timings, outcomes, upstream_calls, memory_kb, sessions):
+    metrics = {}
+    for name, values in timings.items():
+        metrics[f"{name} p50_ms"] = round(percentile(values, 50), 1)
+        metrics[f"{name} p95_ms"] = round(percentile(values, 95), 1)
+    metrics["메모리_kb"] = round(memory_kb, 1)
+    metrics["업스트림 호출_per_session"] = round(upstream_calls / sessions, 2)
+    metrics["추천 실패_sessions"] = outcomes.get("failed", 0)
+    return metrics
+
+
+def compare(metrics, baseline, tolerance):
+    # 모든 지표는 작을수록 좋습니다
+    regressions = []
+    for name, expected in baseline.items():
+        if name not in metrics:
+            continue
+        slack = next((value for suffix, value in ABSOLUTE_SLACK.items() if name.endswith(suffix)), 0.0)
+        limit = expected * (1 + tolerance) + slack
+        if metrics[name] > limit:
+            regressions.append((name, expected, metrics[name], limit))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="app.py 부하 테스트")
+    parser.add_argument("--app", default="app.py")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3, help="세션당 채팅 질문 수")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시에 실행할 세션 수")
+    parser.add_argument("--profiles", type=int, default=0, help="세션들이 나눠 쓸 프로필 수 (0이면 세션마다 다른 프로필)")
+    parser.add_argument("--memory-sessions", type=int, default=3, help="메모리를 따로 잴 세션 수 (0이면 건너뜀)")
+    parser.add_argument("--latency", type=float, default=0.0, help="가짜 서버 응답 지연 (초)")
+    parser.add_argument("--chunk-size", type=int, default=16)
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="스트리밍 조각 사이 지연 (초)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429 응답 비율")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="500 응답 비율")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="깨진 추천 JSON 비율")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="기준값 대비 허용 증가율")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    server = FakeOpenAIServer(latency=args.latency, chunk_size=args.chunk_size, chunk_delay=args.chunk_delay,
+                              rate_limit_rate=args.rate_limit_rate, server_error_rate=args.server_error_rate,
+                              malformed_rate=args.malformed_rate, seed=args.seed).start()
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    use_secrets_file(workdir)
+    allow_concurrent_apptests(args.app)
+    # 이전 실행의 추천/답변 캐시와 앱의 요청 한도 대기가 측정값에 섞이지 않게 합니다
+    os.environ["RECOMMEND_CACHE_PATH"] = os.path.join(workdir, "recommendations.sqlite3")
+    os.environ["RECOMMEND_PRECOMPUTED_PATH"] = os.path.join(workdir, "precomputed.sqlite3")
+    os.environ["CHAT_CACHE_PATH"] = os.path.join(workdir, "answers.sqlite3")
+    os.environ["SESSION_STORE_PATH"] = os.path.join(workdir, "sessions.sqlite3")
+    os.environ.setdefault("OPENAI_RPM", "100000")
+    os.environ.setdefault("OPENAI_TPM", "100000000")
+
+    timings = {}
+    started = time.perf_counter()
+    try:
+        outcomes = run_sessions(args.app, args.sessions, args.turns, args.concurrency, args.profiles, timings)
+        upstream_calls = server.request_count
+        memory_kb = measure_memory(args.app, args.turns, args.memory_sessions, args.sessions) if args.memory_sessions else 0.0
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    elapsed = time.perf_counter() - started
+
+    metrics = collect_metrics(timings, outcomes, upstream_calls, memory_kb, args.sessions)
+    print(f"세션 {args.sessions}개 (동시 {args.concurrency}개) · {elapsed:.1f}초 · 추천 결과 {outcomes} · "
+          f"업스트림 응답 {dict(sorted(server.status_counts.items()))} (깨진 JSON {server.malformed_count})")
+    print(f"{'상호작용':<12} {'횟수':>5} {'평균(ms)':>10} {'p50(ms)':>10} {'p95(ms)':>10}")
+    for name, values in timings.items():
+        print(f"{name:<12} {len(values):>5} {statistics.mean(values):>10.1f} "
+              f"{percentile(values, 50):>10.1f} {percentile(values, 95):>10.1f}")
+    print(f"추천 끝까지 p50 {metrics['추천 요청 p50_ms']}ms · p95 {metrics['추천 요청 p95_ms']}ms · "
+          f"세션당 메모리 {memory_kb:.0f}KB · 세션당 업스트림 호출 {metrics['업스트림 호출_per_session']}회")
+
+    scenario = {key: getattr(args, key) for key in SCENARIO_KEYS}
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"scenario": scenario, "metrics": metrics}, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"기준값을 저장했습니다: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"기준값 파일이 없습니다: {args.baseline} (--update-baseline으로 만드세요)")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["scenario"] != scenario:
+        # 조건이 다른 실행끼리 비교하면 회귀가 아닌 차이도 회귀로 나옵니다
+        different = {key: (baseline["scenario"].get(key), value) for key, value in scenario.items()
+                     if baseline["scenario"].get(key) != value}
+        print(f"\n⛔ 기준값과 시나리오가 달라 비교하지 않습니다 (기준 → 현재): {different}", file=sys.stderr)
+        print("같은 옵션으로 실행하거나 --baseline으로 다른 기준값 파일을 지정하세요.", file=sys.stderr)
+        return 2
+    regressions = compare(metrics, baseline["metrics"], args.tolerance)
+    if regressions:
+        print(f"\n❌ 성능 회귀 {len(regressions)}건 (허용 증가율 {args.tolerance:.0%})", file=sys.stderr)
+        for name, expected, actual, limit in regressions:
+            print(f"  {name}: 기준 {expected} → 현재 {actual} (한도 {limit:.1f})", file=sys.stderr)
+        return 1
+    print("✅ 기준값 대비 회귀 없음")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
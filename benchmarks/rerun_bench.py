@@ -0,0 +1,84 @@
+"""app.py 상호작용별 서버 실행 시간 측정 (Streamlit AppTest + 가짜 OpenAI 서버).
+
+    python -m benchmarks.rerun_bench --turns 10
+
+AppTest는 프래그먼트만 다시 실행하지 못하고 항상 스크립트 전체를 실행하므로,
+여기서 재는 값은 상호작용 한 번에 드는 전체 재실행 시간의 상한입니다.
+폼 안의 위젯 변경은 브라우저에서 재실행을 일으키지 않으므로 0으로 기록합니다.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from fake_openai import FakeOpenAIServer
+
+
+def timed_run(at, timings, name):
+    started = time.perf_counter()
+    at.run()
+    timings.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+    if at.exception:
+        raise RuntimeError(f"{name}: {at.exception[0].message}")
+
+
+def widget_run(at, widget, timings, name):
+    # 폼 안의 위젯은 브라우저가 제출 때까지 모아 두므로 재실행이 일어나지 않습니다
+    if getattr(widget, "form_id", ""):
+        timings.setdefault(name, []).append(0.0)
+    else:
+        timed_run(at, timings, name)
+
+
+def run_session(app_path, turns, timings, subject="중학교 2학년 수학", api_key="test"):
+    # api_key=None이면 at.secrets를 쓰지 않고 설정된 secrets.toml을 그대로 씁니다
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.abspath(app_path), default_timeout=60)
+    if api_key is not None:
+        at.secrets["OPENAI_API_KEY"] = api_key
+    timed_run(at, timings, "첫 화면")
+
+    for option in ("AI 기반 맞춤형 교육", "회복적 생활교육"):
+        checkbox = at.checkbox(key=f"cb_{option}").check()
+        widget_run(at, checkbox, timings, "관심 분야 체크")
+    subject = at.text_input[1].input(subject)
+    widget_run(at, subject, timings, "담당 과목 입력")
+
+    [button for button in at.button if "추천" in button.label][0].click()
+    timed_run(at, timings, "추천 요청")
+
+    for turn in range(turns):
+        at.chat_input[0].set_value(f"{turn}번째 질문: 연수 학점은 어떻게 인정되나요?")
+        timed_run(at, timings, "채팅 질문")
+    return at
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="app.py 재실행 시간 측정")
+    parser.add_argument("--app", default="app.py")
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=10, help="세션당 채팅 질문 수")
+    args = parser.parse_args(argv)
+
+    server = FakeOpenAIServer().start()
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    # 앱의 요청 한도 대기가 측정값에 섞이지 않도록 충분히 크게 둡니다
+    os.environ.setdefault("OPENAI_RPM", "100000")
+    os.environ.setdefault("OPENAI_TPM", "100000000")
+    timings = {}
+    try:
+        for _ in range(args.sessions):
+            run_session(args.app, args.turns, timings)
+    finally:
+        server.stop()
+
+    print(f"{'상호작용':<12} {'횟수':>5} {'평균(ms)':>10} {'p50(ms)':>10} {'최대(ms)':>10}")
+    for name, values in timings.items():
+        print(f"{name:<12} {len(values):>5} {statistics.mean(values):>10.1f} "
+              f"{statistics.median(values):>10.1f} {max(values):>10.1f}")
+    print(f"업스트림 호출 {server.request_count}회")
+
+
+if __name__ == "__main__":
+    main()
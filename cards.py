@@ -0,0 +1,44 @@
+"""추천 카드와 채팅 말풍선 HTML.
+
+재실행마다 같은 연수 카드와 지난 대화를 다시 그리므로, 한 번 만든 HTML은
+프로세스 전체에서 재사용합니다 (Streamlit 스크립트가 아닌 모듈에 두어야 캐시가 유지됩니다).
+"""
+import html
+import json
+from functools import lru_cache
+
+
+def _text(value):
+    return html.escape(str(value)).replace("\n", "<br>")
+
+
+@lru_cache(maxsize=1024)
+def _course_card_html(index, course_json):
+    course = json.loads(course_json)
+    get = lambda field, default="-": _text(course.get(field) or default)
+    return f"""<div class='card'>
+<h3>{index + 1}. {get('title', '제목 없음')}</h3>
+<p class='card-caption'>🎯 추천 대상: {get('target_audience', '정보 없음')}</p>
+<div class='card-meta'>
+<span><strong>카테고리:</strong> {get('category')}</span>
+<span><strong>형태:</strong> {get('format')}</span>
+<span><strong>학점:</strong> {get('credits')}</span>
+</div>
+<p><strong>📅 기간:</strong> {get('duration')}</p>
+<p><strong>📝 내용:</strong> {get('description')}</p>
+<div class='highlight'>📈 기대 효과: {get('benefits')}</div>
+<p><strong>💡 추천 이유:</strong> {get('recommendation_reason')}</p>
+<p><strong>🚀 현장 적용 Tip:</strong> {get('practical_application')}</p>
+</div>"""
+
+
+def course_card_html(index, course):
+    return _course_card_html(index, json.dumps(course, ensure_ascii=False, sort_keys=True))
+
+
+@lru_cache(maxsize=4096)
+def message_html(role, content):
+    # 기존 말풍선과 같이 내용은 그대로 넣어 마크다운 표기가 유지되도록 합니다
+    if role == "user":
+        return f"<div class='user-message'><strong>나:</strong> {content}</div>"
+    return f"<div class='assistant-message'><strong>챗봇:</strong> {content}</div>"
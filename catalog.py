@@ -0,0 +1,239 @@
+"""연수 카탈로그와 검색 인덱스.
+
+카탈로그(JSONL 또는 Parquet)의 연수를 한글 문자 n-gram BM25로 점수화하고,
+학교급/연수 형태/연수 시간은 미리 만들어 둔 비트맵(bool 배열)으로 걸러
+상위 k개 후보를 수 밀리초 안에 돌려줍니다. LLM은 이 후보를 고르고 설명만 합니다.
+
+카탈로그 한 줄의 예:
+    {"title": "AI 디지털 교과서 활용 수업 디자인 실습", "category": "디지털 역량 강화",
+     "format": "온라인", "credits": "1학점", "duration": "15시간",
+     "target_level": ["초등학교", "중학교"], "schedule": ["평일 저녁", "주말"],
+     "description": "..."}
+target_level/schedule이 비어 있거나 "전체"를 포함하면 모든 값과 맞는 것으로 봅니다.
+"""
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from recommender import CATEGORIES, PREFERENCES, SCHOOL_LEVELS, TIME_PREFERENCES
+
+CATALOG_FIELDS = ["title", "category", "format", "credits", "duration", "target_level", "schedule", "description"]
+ANY = "전체"
+
+# 선호 형태별로 허용하는 연수 형태
+COMPATIBLE_FORMATS = {
+    "온라인": {"온라인", "실시간 온라인", "비실시간 온라인"},
+    "오프라인": {"오프라인"},
+    "혼합형": {"혼합형"},
+    "실시간 온라인": {"실시간 온라인", "온라인"},
+    "비실시간 온라인": {"비실시간 온라인", "온라인"},
+}
+
+_WORD_RE = re.compile(r"[0-9A-Za-z가-힣]+")
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    return list(value)
+
+
+def load_catalog(path):
+    if path.endswith(".parquet"):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("Parquet 카탈로그를 읽으려면 pandas와 pyarrow를 설치해주세요.")
+        records = pd.read_parquet(path).to_dict("records")
+    else:
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    courses = []
+    for record in records:
+        course = {field: record.get(field) for field in CATALOG_FIELDS}
+        course["target_level"] = _as_list(course["target_level"])
+        course["schedule"] = _as_list(course["schedule"])
+        courses.append(course)
+    return courses
+
+
+def catalog_version(path):
+    # 카탈로그 파일이 바뀌면 달라지는 값 (검색 인덱스와 재정렬 결과 캐시 키에 씁니다)
+    stat = os.stat(path)
+    identity = f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:12]
+
+
+def char_ngrams(text, sizes=(2, 3)):
+    # 띄어쓰기가 제각각인 한글 제목도 맞도록 단어 단위 대신 문자 n-gram을 씁니다
+    grams = []
+    for word in _WORD_RE.findall((text or "").lower()):
+        if len(word) < min(sizes):
+            grams.append(word)
+            continue
+        for n in sizes:
+            grams.extend(word[i:i + n] for i in range(len(word) - n + 1))
+    return grams
+
+
+def _document_text(course):
+    return " ".join(str(course.get(field) or "") for field in ("title", "category", "description"))
+
+
+class CatalogIndex:
+    def __init__(self, courses, k1=1.2, b=0.75):
+        self.courses = courses
+        n_docs = len(courses)
+        vocabulary = {}
+        term_ids, doc_ids, tfs = [], [], []
+        lengths = np.zeros(n_docs, dtype=np.float32)
+        for doc_id, course in enumerate(courses):
+            counts = Counter(char_ngrams(_document_text(course)))
+            lengths[doc_id] = sum(counts.values())
+            for gram, tf in counts.items():
+                term_ids.append(vocabulary.setdefault(gram, len(vocabulary)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+        self.vocabulary = vocabulary
+
+        # 용어별 게시 목록을 CSR 형태로 모으고 BM25 가중치를 미리 계산해 둡니다
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        tfs = np.asarray(tfs, dtype=np.float32)[order]
+        df = np.bincount(term_ids, minlength=len(vocabulary)).astype(np.float32)
+        self.indptr = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        avg_length = float(lengths.mean()) if n_docs else 0.0
+        norm = k1 * (1 - b + b * lengths[self.doc_ids] / (avg_length or 1.0))
+        self.weights = (idf[term_ids[order]] * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32)
+
+        # 필터 비트맵
+        self.level_bits = self._bitmap(SCHOOL_LEVELS, lambda c, v: not c["target_level"] or ANY in c["target_level"] or v in c["target_level"])
+        self.format_bits = self._bitmap(PREFERENCES, lambda c, v: not c["format"] or c["format"] == ANY or c["format"] in COMPATIBLE_FORMATS[v])
+        self.schedule_bits = self._bitmap(TIME_PREFERENCES, lambda c, v: not c["schedule"] or ANY in c["schedule"] or v in c["schedule"])
+
+    def _bitmap(self, values, match):
+        return {v: np.fromiter((match(c, v) for c in self.courses), dtype=bool, count=len(self.courses)) for v in values}
+
+    def __len__(self):
+        return len(self.courses)
+
+    def scores(self, query):
+        scores = np.zeros(len(self.courses), dtype=np.float32)
+        for gram, qtf in Counter(char_ngrams(query)).items():
+            term_id = self.vocabulary.get(gram)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            # 한 용어의 게시 목록에는 같은 문서가 한 번만 나오므로 팬시 인덱싱 덧셈이 안전합니다
+            scores[self.doc_ids[start:end]] += qtf * self.weights[start:end]
+        return scores
+
+    def filter_mask(self, school_level=None, preference=None, time_preference=()):
+        mask = np.ones(len(self.courses), dtype=bool)
+        if school_level in self.level_bits:
+            mask &= self.level_bits[school_level]
+        if preference in self.format_bits:
+            mask &= self.format_bits[preference]
+        if time_preference:
+            any_time = np.zeros(len(self.courses), dtype=bool)
+            for value in time_preference:
+                if value in self.schedule_bits:
+                    any_time |= self.schedule_bits[value]
+            mask &= any_time
+        return mask
+
+    def search(self, query, k=10, school_level=None, preference=None, time_preference=()):
+        scores = self.scores(query)
+        # 후보가 모자라면 시간, 형태 순으로 필터를 완화합니다
+        for filters in ((school_level, preference, time_preference), (school_level, preference, ()), (school_level, None, ())):
+            mask = self.filter_mask(*filters)
+            candidates = np.flatnonzero(mask & (scores > 0))
+            if len(candidates) >= k:
+                break
+        if len(candidates) > k:
+            top = np.argpartition(-scores[candidates], k - 1)[:k]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.courses[i], float(scores[i])) for i in candidates]
+
+
+def profile_query(profile):
+    # 관심 분야와 그 상위 카테고리, 담당 과목을 검색어로 씁니다
+    parents = [category for category, options in CATEGORIES.items() if set(options) & set(profile.interests)]
+    return " ".join([*profile.interests, *parents, profile.subject])
+
+
+def search_profile(index, profile, k=10):
+    return index.search(profile_query(profile), k=k, school_level=profile.school_level,
+                        preference=profile.preference, time_preference=profile.time_preference)
+
+
+def catalog_course_card(course, profile):
+    # LLM 없이 카탈로그 정보만으로 카드에 쓸 항목을 만듭니다 (catalog-only 모드)
+    matched = [interest for interest in profile.interests
+               if set(char_ngrams(interest)) & set(char_ngrams(_document_text(course)))]
+    levels = ", ".join(course["target_level"]) if course["target_level"] else ANY
+    return {
+        "title": course.get("title") or "제목 없음",
+        "category": course.get("category") or "-",
+        "target_audience": f"{levels} 교사",
+        "format": course.get("format") or "-",
+        "duration": f"{course.get('duration') or '-'} ({', '.join(course['schedule']) or ANY})",
+        "credits": course.get("credits") or "-",
+        "description": course.get("description") or "-",
+        "benefits": "-",
+        "recommendation_reason": f"관심 분야({', '.join(matched or profile.interests)})와 관련된 연수입니다.",
+        "practical_application": "-",
+    }
+
+
+def format_candidates(candidates):
+    # 재정렬 프롬프트에 넣을 후보 목록 (번호: 제목 | 카테고리 | 형태 | 학점 | 기간 | 대상 | 일정 | 설명)
+    lines = []
+    for i, (course, _) in enumerate(candidates, 1):
+        lines.append(" | ".join([
+            f"{i}. {course.get('title')}",
+            str(course.get("category") or "-"),
+            str(course.get("format") or "-"),
+            str(course.get("credits") or "-"),
+            str(course.get("duration") or "-"),
+            ", ".join(course["target_level"]) or ANY,
+            ", ".join(course["schedule"]) or ANY,
+            str(course.get("description") or "-"),
+        ]))
+    return "\n".join(lines)
+
+
+def _title_key(title):
+    # "3. AI 디지털 교과서 활용..."처럼 번호를 붙이거나 띄어쓰기를 바꿔 돌려줘도 같은 제목으로 봅니다
+    title = re.sub(r"^\s*\d+\.\s*", "", str(title or ""))
+    return "".join(_WORD_RE.findall(title.lower()))
+
+
+def match_candidate(course, candidates):
+    """LLM이 고른 연수를 후보 목록의 카탈로그 항목과 맞춥니다. 후보에 없는 연수면 None.
+
+    제목/카테고리/형태/학점/기간은 카탈로그 값으로 덮어쓰고, 설명 항목만 LLM 응답을 씁니다.
+    """
+    key = _title_key(course.get("title"))
+    if not key:
+        return None
+    for candidate, _ in candidates:
+        if _title_key(candidate.get("title")) == key:
+            return {
+                **course,
+                "title": candidate.get("title"),
+                "category": candidate.get("category") or "-",
+                "format": candidate.get("format") or "-",
+                "credits": candidate.get("credits") or "-",
+                "duration": candidate.get("duration") or "-",
+            }
+    return None
@@ -0,0 +1,78 @@
+"""상담 챗봇의 대화 문맥 관리.
+
+매 요청은 [고정 시스템 프롬프트] + [지난 대화 요약] + [최근 대화] + [새 질문] 순서로 만듭니다.
+고정 프롬프트가 맨 앞에 바이트 단위로 같게 놓여야 업스트림 프롬프트 캐시가 적용되고,
+요약은 가끔만 갱신하므로 그 뒤까지도 대부분 그대로 재사용됩니다.
+최근 대화는 토큰 예산 안에서 최신 것부터 담고, 예산 밖으로 밀려난 대화가 쌓이면 요약에 합칩니다.
+"""
+from throttle import approx_tokens
+
+SUMMARY_MODEL = "gpt-4o-mini"
+
+SUMMARY_PROMPT = """
+        다음은 교사와 연수 상담 챗봇의 지난 대화 요약과 그 뒤에 이어진 대화입니다.
+        앞으로의 상담에 필요한 내용(교사의 상황, 관심 있는 연수, 이미 안내한 정보, 남은 궁금증)만 남겨
+        {max_chars}자 이내의 한국어 요약으로 다시 정리해주세요. 요약문만 답변하세요.
+        """
+
+
+class ChatContext:
+    def __init__(self, budget_tokens=1500, keep_recent=4, summarize_every=6, summary_chars=600):
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.summarize_every = summarize_every
+        self.summary_chars = summary_chars
+        self.summary = ""
+        self.summarized = 0  # 요약에 합쳐진 history 앞부분의 메시지 수
+
+    def state(self):
+        return {"summary": self.summary, "summarized": self.summarized}
+
+    def restore(self, state):
+        self.summary = state.get("summary", "")
+        self.summarized = state.get("summarized", 0)
+
+    def recent(self, history):
+        # 요약되지 않은 대화 중 최신 것부터 예산 안에 들어가는 만큼
+        budget = self.budget_tokens - approx_tokens(self.summary)
+        window = []
+        for message in reversed(history[self.summarized:]):
+            cost = approx_tokens(message["content"]) + 4
+            if cost > budget:
+                break
+            budget -= cost
+            window.append({"role": message["role"], "content": message["content"]})
+        window.reverse()
+        return window
+
+    def build_messages(self, system_prompt, history, question):
+        messages = [{"role": "system", "content": system_prompt}]
+        if self.summary:
+            messages.append({"role": "system", "content": f"지난 대화 요약:\n{self.summary}"})
+        messages.extend(self.recent(history))
+        messages.append({"role": "user", "content": question})
+        return messages
+
+    def dropped(self, history):
+        # 요약되지 않았는데 예산 밖으로 밀려나 요청에 들어가지 못하는 메시지 수
+        return len(history) - self.summarized - len(self.recent(history))
+
+    def needs_summary(self, history):
+        return self.dropped(history) >= self.summarize_every
+
+    def summarize(self, llm, history, **kwargs):
+        # 최근 keep_recent개를 뺀 나머지를 기존 요약에 합칩니다
+        upto = len(history) - self.keep_recent
+        folded = "\n".join(f"{'교사' if m['role'] == 'user' else '챗봇'}: {m['content']}"
+                           for m in history[self.summarized:upto])
+        response = llm.create(
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT.format(max_chars=self.summary_chars)},
+                {"role": "user", "content": f"[지난 대화 요약]\n{self.summary or '없음'}\n\n[이어진 대화]\n{folded}"},
+            ],
+            max_tokens=self.summary_chars,
+            **kwargs,
+        )
+        self.summary = (response.choices[0].message.content or "").strip()
+        self.summarized = upto
@@ -0,0 +1,216 @@
+"""로컬 테스트용 OpenAI 호환 가짜 서버 (표준 라이브러리만 사용).
+
+`/v1/chat/completions`에 대해 추천 JSON 또는 짧은 상담 답변을 돌려주며, stream=True면 SSE로 나눠 보냅니다.
+실제 API 키 없이 precompute.py 등을 확인하거나 부하 테스트(benchmarks.load_test)에서 씁니다.
+429/500 응답과 깨진 추천 JSON을 정해진 비율로 섞어 보낼 수 있습니다 (seed로 재현 가능).
+
+    python fake_openai.py --port 8000
+    python precompute.py --enumerate --base-url http://127.0.0.1:8000/v1 --api-key test
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_COURSES = [
+    {
+        "title": f"가짜 연수 {i}",
+        "category": "교수학습 혁신",
+        "target_audience": "테스트 대상",
+        "format": "온라인",
+        "duration": "15시간",
+        "credits": "1학점",
+        "description": "로컬 테스트용 연수 설명",
+        "benefits": "테스트 효과",
+        "recommendation_reason": "테스트 이유",
+        "practical_application": "테스트 적용 방법",
+    }
+    for i in range(1, 4)
+]
+
+
+class FakeOpenAIServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, chunk_size=16, chunk_delay=0.0,
+                 rate_limit_rate=0.0, server_error_rate=0.0, malformed_rate=0.0, retry_after=0.0, seed=0):
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.malformed_rate = malformed_rate
+        self.retry_after = retry_after
+        self.request_count = 0
+        self.status_counts = {}
+        self.malformed_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def completion_text(self, body, malformed=False):
+        if body.get("response_format", {}).get("type") == "json_object":
+            text = json.dumps({"recommended_courses": FAKE_COURSES}, ensure_ascii=False)
+            # 깨진 JSON: 중간에서 잘린 응답 (앞쪽 연수 객체는 온전히 남습니다)
+            return text[:len(text) * 2 // 3] if malformed else text
+        return "가짜 상담 답변입니다."
+
+    def pick_fault(self, body):
+        # 요청마다 한 번 뽑아 429 / 500 / 깨진 JSON / 정상 중 하나를 정합니다
+        with self._lock:
+            self.request_count += 1
+            roll = self._random.random()
+            if roll < self.rate_limit_rate:
+                status = 429
+            elif roll < self.rate_limit_rate + self.server_error_rate:
+                status = 500
+            else:
+                status = 200
+            malformed = (status == 200 and body.get("response_format", {}).get("type") == "json_object"
+                         and self._random.random() < self.malformed_rate)
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            self.malformed_count += malformed
+        return status, malformed
+
+    def usage(self, body, text):
+        # 실제 토크나이저 대신 UTF-8 바이트 수로 어림합니다
+        prompt_tokens = sum(len(str(m.get("content", "")).encode("utf-8")) for m in body.get("messages", [])) // 3
+        completion_tokens = len(text.encode("utf-8")) // 3
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                status, malformed = server.pick_fault(body)
+                if server.latency:
+                    time.sleep(server.latency)
+                if status != 200:
+                    self._send_error(status)
+                    return
+                text = server.completion_text(body, malformed)
+                if body.get("stream"):
+                    self._send_stream(body, text)
+                    return
+                payload = {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "gpt-4o"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": server.usage(body, text),
+                }
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_error(self, status):
+                kind = "rate_limit_exceeded" if status == 429 else "server_error"
+                data = json.dumps({"error": {"message": f"fake {status}", "type": kind, "code": kind}}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", f"{server.retry_after:g}")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, body, text):
+                try:
+                    self._write_stream(body, text)
+                except (BrokenPipeError, ConnectionResetError):
+                    # 클라이언트가 시간 초과나 취소로 먼저 연결을 끊은 경우
+                    self.close_connection = True
+
+            def _write_stream(self, body, text):
+                # SSE로 chunk_size 글자씩 나눠 보냅니다
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for i in range(0, len(text), server.chunk_size):
+                    chunk = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "gpt-4o"),
+                        "choices": [{"index": 0, "delta": {"content": text[i:i + server.chunk_size]}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if server.chunk_delay:
+                        time.sleep(server.chunk_delay)
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    chunk = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "gpt-4o"),
+                        "choices": [],
+                        "usage": server.usage(body, text),
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI 호환 가짜 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="응답 지연 (초)")
+    parser.add_argument("--chunk-size", type=int, default=16, help="스트리밍 조각당 글자 수")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="스트리밍 조각 사이 지연 (초)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429로 응답할 비율")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="500으로 응답할 비율")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="추천 JSON을 잘라 보낼 비율")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="429 응답의 Retry-After (초)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    server = FakeOpenAIServer(args.host, args.port, args.latency, args.chunk_size, args.chunk_delay,
+                              args.rate_limit_rate, args.server_error_rate, args.malformed_rate,
+                              args.retry_after, args.seed)
+    print(f"가짜 OpenAI 서버: {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""프로세스 전체에서 함께 쓰는 OpenAI 호출 계층.
+
+- 연결 풀(keep-alive)을 가진 클라이언트 하나를 모든 세션이 공유합니다.
+- 호출마다 마감 시간(deadline)을 두고, 429/5xx/연결 오류는 지터를 섞은 지수 백오프로 재시도합니다.
+- 연속 실패가 쌓이면 회로 차단기가 열려 한동안 바로 실패하고, 호출하는 쪽은 캐시나 카탈로그로 대신 응답합니다.
+"""
+import random
+import threading
+import time
+
+import httpx
+import openai
+from openai import OpenAI
+
+from telemetry import Telemetry, usage_tokens
+from throttle import RateLimitTimeout, estimate_tokens
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """회로 차단기가 열려 있어 업스트림을 호출하지 않았습니다."""
+
+
+class DeadlineExceededError(Exception):
+    """재시도를 포함한 전체 호출 시간이 마감을 넘었습니다."""
+
+
+class StreamInterruptedError(Exception):
+    """스트리밍 응답을 받는 도중에 연결이 끊기거나 멈췄습니다."""
+
+# 스트리밍 응답을 읽는 도중에 나는 업스트림 장애
+STREAM_ERRORS = (httpx.TransportError, openai.APIError)
+
+
+def create_client(api_key, base_url=None, pool_size=20, keepalive_expiry=30.0, connect_timeout=5.0):
+    # SDK 자체 재시도는 끄고 ResilientLLM에서 마감 시간에 맞춰 재시도합니다
+    http_client = openai.DefaultHttpxClient(
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                            keepalive_expiry=keepalive_expiry),
+        timeout=httpx.Timeout(60.0, connect=connect_timeout),
+    )
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+
+
+def is_retryable(error):
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS
+    return False
+
+
+class CircuitBreaker:
+    """연속 실패 failure_threshold회면 열리고, reset_timeout초 뒤 시험 호출 1건만 허용합니다."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self.opened_at is None:
+            return "closed"
+        if now - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def cancel(self):
+        # 업스트림을 호출하지 못하고 끝난 경우 시험 호출 자리만 돌려놓습니다
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class GuardedStream:
+    """스트리밍 응답을 끝까지 읽으면 성공, 도중에 끊기면 실패로 회로 차단기에 기록합니다.
+
+    읽는 쪽이 중간에 그만두면(Streamlit 재실행 등) 어느 쪽으로도 세지 않고 연결만 닫습니다.
+    limiter가 있으면 마지막 청크의 사용량(include_usage)으로 미리 받은 토큰 추정치를 정산합니다.
+    """
+
+    def __init__(self, stream, breaker, telemetry, limiter=None, reserved_tokens=0):
+        self.stream = stream
+        self.breaker = breaker
+        self.telemetry = telemetry
+        self.limiter = limiter
+        self.reserved_tokens = reserved_tokens
+
+    def __iter__(self):
+        outcome = None
+        try:
+            for chunk in self.stream:
+                usage = getattr(chunk, "usage", None)
+                if usage is not None and self.limiter is not None:
+                    self.limiter.settle(self.reserved_tokens, usage.total_tokens)
+                yield chunk
+            outcome = "success"
+        except STREAM_ERRORS as e:
+            outcome = "failure"
+            self.breaker.record_failure()
+            self.telemetry.incr("llm_failures_total", reason=type(e).__name__)
+            raise StreamInterruptedError("응답을 받는 중에 연결이 끊겼습니다.") from e
+        finally:
+            if outcome == "success":
+                self.breaker.record_success()
+            elif outcome is None:
+                self.breaker.cancel()
+                self.stream.close()
+
+    def close(self):
+        self.breaker.cancel()
+        self.stream.close()
+
+
+class ResilientLLM:
+    def __init__(self, client, breaker=None, limiter=None, telemetry=None, deadline=30.0, max_attempts=4,
+                 base_delay=0.5, max_delay=8.0):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter
+        self.telemetry = telemetry or Telemetry()
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def create(self, deadline=None, session_id=None, **kwargs):
+        """chat.completions.create를 마감 시간 안에서 재시도하며 호출합니다.
+
+        stream=True이면 응답 헤더를 받은 시점까지만 재시도하고 스트림 객체를 돌려줍니다.
+        스트림을 읽는 도중의 장애는 회로 차단기에 실패로 기록하고 StreamInterruptedError로 알립니다.
+        limiter가 있으면 시도할 때마다 session_id의 대기열에서 요청/토큰 한도를 받습니다.
+        """
+        if not self.breaker.allow():
+            self.telemetry.incr("llm_circuit_open_total")
+            raise CircuitOpenError("업스트림 응답이 불안정해 잠시 호출을 멈췄습니다.")
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        tokens = estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens") or 1000)
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self.breaker.record_failure()
+                raise DeadlineExceededError("응답 시간이 초과되었습니다.")
+            if self.limiter is not None:
+                try:
+                    self.limiter.acquire(tokens, session=session_id, timeout=remaining)
+                except RateLimitTimeout:
+                    self.breaker.cancel()
+                    raise DeadlineExceededError("요청이 몰려 응답 시간이 초과되었습니다.")
+                remaining = deadline_at - time.monotonic()
+            try:
+                response = self.client.chat.completions.create(timeout=remaining, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    if isinstance(e, openai.APIStatusError):
+                        # 잘못된 요청 등은 업스트림이 응답은 한 것이므로 장애로 세지 않습니다
+                        self.breaker.record_success()
+                    else:
+                        # 응답을 받기 전에 난 다른 예외는 업스트림 상태를 알 수 없으므로 어느 쪽으로도 세지 않습니다
+                        self.breaker.cancel()
+                    raise
+                if attempt >= self.max_attempts:
+                    self.breaker.record_failure()
+                    self.telemetry.incr("llm_failures_total", reason=type(e).__name__)
+                    raise
+                delay = self._backoff(attempt, e)
+                if time.monotonic() + delay >= deadline_at:
+                    self.breaker.record_failure()
+                    self.telemetry.incr("llm_failures_total", reason=type(e).__name__)
+                    raise
+                self.telemetry.incr("llm_retries_total", reason=type(e).__name__)
+                time.sleep(delay)
+                continue
+            if kwargs.get("stream"):
+                # 헤더만 받은 상태이므로 성공/실패는 스트림을 다 읽은 뒤에 기록합니다
+                return GuardedStream(response, self.breaker, self.telemetry, self.limiter, tokens)
+            self.breaker.record_success()
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                if self.limiter is not None:
+                    self.limiter.settle(tokens, usage.total_tokens)
+                self.telemetry.record_usage(session_id, kwargs.get("model"), *usage_tokens(usage))
+            return response
+
+    def _backoff(self, attempt, error):
+        # Retry-After가 있으면 따르고, 없으면 full jitter 지수 백오프
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
@@ -0,0 +1,151 @@
+"""추천 결과 사전 계산 CLI (Streamlit 없이 실행).
+
+방학 전처럼 요청이 몰리는 시기에 자주 쓰이는 프로필의 추천을 미리 만들어 두면
+app.py는 시작할 때 이 저장소를 열고 LLM 호출 없이 바로 답을 돌려줍니다.
+
+예시:
+    python precompute.py --enumerate --max-interests 1 --concurrency 8 --rpm 300
+    python precompute.py --profiles profiles.jsonl --month "2026년 12월"
+    python precompute.py --enumerate --base-url http://127.0.0.1:8000/v1 --api-key test
+
+프로필 파일은 한 줄에 하나씩 JSON 객체이며 키는 school_level, teaching_experience,
+interests, preference, time_preference, subject 입니다 (없는 키는 기본값 사용).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+
+from openai import AsyncOpenAI
+
+from rec_cache import PrecomputedStore
+from recommender import (
+    CATEGORIES, EXPERIENCE_BUCKETS, PREFERENCES, SCHOOL_LEVELS,
+    build_recommendation_prompt, current_month, normalize_profile, parse_recommendations,
+)
+
+DEFAULT_STORE_PATH = os.environ.get("RECOMMEND_PRECOMPUTED_PATH", ".cache/precomputed.sqlite3")
+
+
+def enumerate_profiles(month, school_levels=None, preferences=None, max_interests=1):
+    interests = [option for options in CATEGORIES.values() for option in options]
+    combos = [c for size in range(1, max_interests + 1) for c in itertools.combinations(interests, size)]
+    for school_level, (low, _, _), preference, combo in itertools.product(
+            school_levels or SCHOOL_LEVELS, EXPERIENCE_BUCKETS, preferences or PREFERENCES, combos):
+        yield normalize_profile(low, school_level, "", combo, preference, [], month=month)
+
+
+def load_profiles(path, month):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+            yield normalize_profile(
+                data.get("teaching_experience", 5),
+                data.get("school_level", SCHOOL_LEVELS[0]),
+                data.get("subject", ""),
+                data.get("interests", []),
+                data.get("preference", PREFERENCES[0]),
+                data.get("time_preference", []),
+                month=month,
+            )
+
+
+class RateLimiter:
+    """분당 요청 수 제한 - 호출 시작 시각을 일정 간격 이상으로 벌립니다."""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def precompute(profiles, store, client, model="gpt-4o", concurrency=4, requests_per_minute=60):
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(requests_per_minute)
+    counts = {"done": 0, "skipped": 0, "failed": 0}
+
+    async def run(profile):
+        key = profile.key()
+        # 이미 저장된 키는 건너뛰므로 중단된 작업을 그대로 다시 실행하면 이어서 진행됩니다
+        if store.has(key):
+            counts["skipped"] += 1
+            return
+        async with semaphore:
+            await limiter.wait()
+            try:
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "system", "content": build_recommendation_prompt(profile)}],
+                    response_format={"type": "json_object"},
+                )
+                courses = parse_recommendations(response.choices[0].message.content)
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"실패 {key}: {e}", file=sys.stderr)
+                return
+        if not courses:
+            counts["failed"] += 1
+            return
+        store.put(key, profile.month, courses)
+        counts["done"] += 1
+
+    # 프로필 수가 많아도 태스크를 한 번에 만들지 않도록 동시 실행 수의 몇 배씩 나눠 처리합니다
+    batch = []
+    for profile in profiles:
+        batch.append(run(profile))
+        if len(batch) >= concurrency * 16:
+            await asyncio.gather(*batch)
+            batch = []
+    if batch:
+        await asyncio.gather(*batch)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="교사 맞춤형 연수 추천 사전 계산")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--profiles", help="프로필 JSONL 파일 경로")
+    source.add_argument("--enumerate", action="store_true", help="사이드바 선택지 조합을 나열")
+    parser.add_argument("--school-levels", nargs="*", choices=SCHOOL_LEVELS)
+    parser.add_argument("--preferences", nargs="*", choices=PREFERENCES)
+    parser.add_argument("--max-interests", type=int, default=1, help="나열할 관심 분야 조합의 최대 개수")
+    parser.add_argument("--month", default=current_month(), help='추천 기준 월 (예: "2026년 12월")')
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH)
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=int, default=60, help="분당 최대 요청 수")
+    parser.add_argument("--max-retries", type=int, default=5, help="429/5xx 재시도 횟수 (Retry-After 준수)")
+    parser.add_argument("--base-url", default=os.environ.get("OPENAI_BASE_URL"))
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"))
+    args = parser.parse_args(argv)
+
+    if args.enumerate:
+        profiles = enumerate_profiles(args.month, args.school_levels, args.preferences, args.max_interests)
+    else:
+        profiles = load_profiles(args.profiles, args.month)
+
+    store = PrecomputedStore(args.store)
+    client = AsyncOpenAI(api_key=args.api_key, base_url=args.base_url, max_retries=args.max_retries)
+    started = time.monotonic()
+    counts = asyncio.run(precompute(profiles, store, client, args.model, args.concurrency, args.rpm))
+    print(f"완료 {counts['done']}건, 건너뜀 {counts['skipped']}건, 실패 {counts['failed']}건 "
+          f"({time.monotonic() - started:.1f}초, 저장소 {len(store)}건)")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""프로필을 입력하는 동안 추천을 미리 요청합니다 (RECOMMEND_PREFETCH=1일 때만).
+
+입력이 debounce초 동안 그대로면 백그라운드 스레드 풀에서 추천을 요청해 캐시에 넣어 두므로,
+"추천받기"를 누를 때는 캐시에서 바로 보여주거나 진행 중인 요청에 합류(single-flight)합니다.
+- 세션마다 대기 중인 프로필은 하나뿐이며, 입력이 바뀌면 이전 대기는 취소됩니다.
+- 이미 시작된 요청은 끊지 않습니다. 같은 요청을 기다리는 다른 세션이 있을 수 있고,
+  결과는 그 프로필의 캐시로 남기 때문입니다. 대신 쓰이지 않은 요청은 낭비로 셉니다.
+- 세션당 실제로 보낸 요청 수는 per_session_limit을 넘지 않습니다.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher:
+    def __init__(self, max_workers=4, debounce=1.5, per_session_limit=3, telemetry=None, max_tracked=4096):
+        self.debounce = debounce
+        self.per_session_limit = per_session_limit
+        self.telemetry = telemetry
+        self.max_tracked = max_tracked
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._pending = {}                 # session -> (key, Timer)
+        self._started = OrderedDict()      # session -> 보낸 요청 수
+        self._prefetched = OrderedDict()   # (session, key) -> 추천 버튼에서 쓰였는지
+        self._capped = OrderedDict()       # session -> 한도 때문에 보내지 못한 마지막 key
+        self.counts = {"superseded": 0, "capped": 0, "started": 0, "completed": 0, "failed": 0, "hits": 0}
+
+    def schedule(self, session, key, fetch, is_cached=None):
+        """프로필이 debounce초 동안 바뀌지 않으면 fetch()를 백그라운드에서 실행합니다."""
+        with self._lock:
+            pending = self._pending.get(session)
+            if pending is not None and pending[0] == key:
+                return
+            if (session, key) in self._prefetched:
+                return
+            if pending is not None:
+                pending[1].cancel()
+                del self._pending[session]
+                self._count("superseded")
+            if self._started.get(session, 0) >= self.per_session_limit:
+                self._cap(session, key)
+                return
+            timer = threading.Timer(self.debounce, self._fire, (session, key, fetch, is_cached))
+            timer.daemon = True
+            self._pending[session] = (key, timer)
+        timer.start()
+
+    def claim(self, session, key):
+        """추천 버튼을 눌렀을 때 부릅니다. 이 세션이 미리 요청해 둔 프로필이면 True."""
+        with self._lock:
+            pending = self._pending.pop(session, None)
+            if pending is not None:
+                # 버튼 쪽에서 바로 요청하므로 대기 중인 것은 보내지 않습니다
+                pending[1].cancel()
+                self._count("superseded")
+            if self._prefetched.get((session, key)) is False:
+                self._prefetched[(session, key)] = True
+                self._count("hits")
+                return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        counts["hit_rate"] = counts["hits"] / counts["started"] if counts["started"] else 0.0
+        counts["wasted"] = counts["started"] - counts["hits"]
+        return counts
+
+    def _fire(self, session, key, fetch, is_cached):
+        with self._lock:
+            pending = self._pending.get(session)
+            if pending is None or pending[0] != key:
+                return
+            del self._pending[session]
+        # 다른 세션이나 사전 계산으로 이미 캐시에 있으면 요청하지 않습니다
+        if is_cached is not None and is_cached(key):
+            return
+        with self._lock:
+            if self._started.get(session, 0) >= self.per_session_limit:
+                self._cap(session, key)
+                return
+            self._started[session] = self._started.get(session, 0) + 1
+            self._started.move_to_end(session)
+            self._prefetched[(session, key)] = False
+            while len(self._prefetched) > self.max_tracked:
+                self._prefetched.popitem(last=False)
+            while len(self._started) > self.max_tracked:
+                self._started.popitem(last=False)
+            self._count("started")
+        self._executor.submit(self._run, fetch)
+
+    def _run(self, fetch):
+        try:
+            fetch()
+        except Exception:
+            with self._lock:
+                self._count("failed")
+        else:
+            with self._lock:
+                self._count("completed")
+
+    def _cap(self, session, key):
+        # 같은 입력으로 다시 실행될 때마다 세지 않도록 프로필이 바뀐 경우만 셉니다
+        if self._capped.get(session) != key:
+            self._capped[session] = key
+            self._capped.move_to_end(session)
+            while len(self._capped) > self.max_tracked:
+                self._capped.popitem(last=False)
+            self._count("capped")
+
+    def _count(self, result):
+        # self._lock을 잡은 상태에서 부릅니다
+        self.counts[result] += 1
+        if self.telemetry is not None:
+            self.telemetry.incr("prefetch_total", result=result)
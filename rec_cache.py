@@ -0,0 +1,191 @@
+"""프로필 키 기반 추천 결과 캐시.
+
+1단계는 프로세스 내 LRU, 2단계는 여러 워커가 함께 쓰는 SQLite 파일입니다.
+추천 프롬프트에 '현재 시점(월)'이 들어가므로 항목은 해당 월이 끝나면 만료됩니다.
+precompute.py로 미리 만들어 둔 추천 파일이 있으면 두 단계 사이에서 먼저 찾아봅니다.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+
+def month_end_timestamp(month):
+    # "2025년 03월" -> 2025-04-01 00:00 (로컬 시간)의 timestamp
+    start = datetime.strptime(month, "%Y년 %m월")
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return end.timestamp()
+
+
+def _connect(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return sqlite3.connect(path, timeout=5, check_same_thread=False)
+
+
+class PrecomputedStore:
+    """사전 계산된 추천 결과 저장소 (zlib 압축 JSON, 키당 한 행).
+
+    precompute.py가 결과를 하나 받을 때마다 바로 기록하므로 중단 후 다시 실행하면
+    이미 저장된 키는 건너뛰고 이어서 진행할 수 있습니다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = _connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS precomputed ("
+            "key TEXT PRIMARY KEY, month TEXT NOT NULL, courses BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def has(self, key):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM precomputed WHERE key = ?", (key,)).fetchone() is not None
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT month, courses FROM precomputed WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(zlib.decompress(row[1]).decode("utf-8"))
+
+    def put(self, key, month, courses):
+        payload = zlib.compress(json.dumps(courses, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO precomputed (key, month, courses, created_at) VALUES (?, ?, ?, ?)",
+                (key, month, payload, time.time()),
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM precomputed").fetchone()[0]
+
+
+class RecommendationCache:
+    def __init__(self, path=None, max_entries=512, precomputed=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.precomputed = precomputed
+        self._memory = OrderedDict()  # key -> (expires_at, courses)
+        self._lock = threading.Lock()
+        self._conn = None
+        self.memory_hits = 0
+        self.precomputed_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            self._conn = _connect(path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS recommendations ("
+                "key TEXT PRIMARY KEY, courses TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key, now=None):
+        now = now or time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+            if self.precomputed is not None:
+                found = self.precomputed.get(key)
+                if found is not None:
+                    expires_at = month_end_timestamp(found[0])
+                    if expires_at > now:
+                        self._remember(key, expires_at, found[1])
+                        self.precomputed_hits += 1
+                        return found[1]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT courses, expires_at FROM recommendations WHERE key = ? AND expires_at > ?",
+                    (key, now),
+                ).fetchone()
+                if row is not None:
+                    courses = json.loads(row[0])
+                    self._remember(key, row[1], courses)
+                    self.disk_hits += 1
+                    return courses
+
+            self.misses += 1
+            return None
+
+    def contains(self, key, now=None):
+        # 적중/미적중 통계에 넣지 않고 유효한 항목이 있는지만 봅니다 (미리 요청할지 정할 때)
+        now = now or time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                return True
+            if self.precomputed is not None:
+                found = self.precomputed.get(key)
+                if found is not None and month_end_timestamp(found[0]) > now:
+                    return True
+            if self._conn is not None:
+                return self._conn.execute(
+                    "SELECT 1 FROM recommendations WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone() is not None
+            return False
+
+    def set(self, key, courses, month, now=None):
+        # 빈 결과는 실패로 보고 저장하지 않습니다
+        if not courses:
+            return
+        now = now or time.time()
+        expires_at = month_end_timestamp(month)
+        with self._lock:
+            self._remember(key, expires_at, courses)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO recommendations (key, courses, expires_at, created_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(courses, ensure_ascii=False), expires_at, now),
+                )
+                self._conn.commit()
+
+    def purge_expired(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            for key in [k for k, (expires_at, _) in self._memory.items() if expires_at <= now]:
+                del self._memory[key]
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM recommendations WHERE expires_at <= ?", (now,))
+                self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.precomputed_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "precomputed_hits": self.precomputed_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def _remember(self, key, expires_at, courses):
+        self._memory[key] = (expires_at, courses)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
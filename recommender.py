@@ -0,0 +1,209 @@
+"""교사 프로필 정규화와 연수 추천 프롬프트 생성.
+
+app.py, 사전 계산 CLI 등 여러 진입점이 같은 프로필 키와 같은 프롬프트를 쓰도록
+Streamlit에 의존하지 않는 순수 함수로 모아 둡니다.
+"""
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+# 사이드바 선택지
+SCHOOL_LEVELS = ["초등학교", "중학교", "고등학교", "특수학교", "기타"]
+PREFERENCES = ["온라인", "오프라인", "혼합형", "실시간 온라인", "비실시간 온라인"]
+TIME_PREFERENCES = ["평일 오전", "평일 오후", "평일 저녁", "주말", "방학 중 집중"]
+
+CATEGORIES = {
+    "교수학습 혁신": ["AI 기반 맞춤형 교육", "프로젝트 기반 학습(PBL)", "하브루타/토론 수업", "게이미피케이션 활용", "학습자 주도성 신장"],
+    "디지털 역량 강화": ["디지털 시민성 교육", "AI 리터러시 및 윤리", "코딩/SW 교육 심화", "데이터 기반 학습 분석", "메타버스 교육 활용"],
+    "학생 성장 지원": ["정서행동 위기학생 지원", "회복적 생활교육", "학부모 상담 전문성", "진로 설계 및 코칭", "다문화 학생 이해"],
+    "미래 교육 대비": ["기후위기/환경생태 교육", "미래사회 변화와 교육", "에듀테크 동향 및 활용", "교육과정 디자인", "IB 프로그램 이해"],
+    "교사 전문성 신장": ["교육 연구 방법론", "전문적 학습공동체 운영", "교사 리더십 개발", "교사 소진 예방 및 힐링", "교육 정책 이해"]
+}
+
+# 교직 경력 구간 (최소, 최대, 표시 문구) - 슬라이더 값 대신 구간으로 캐시 키를 만듭니다
+EXPERIENCE_BUCKETS = [
+    (0, 2, "0~2년차"),
+    (3, 5, "3~5년차"),
+    (6, 10, "6~10년차"),
+    (11, 20, "11~20년차"),
+    (21, 40, "21년차 이상"),
+]
+
+# 프롬프트나 키 형식이 바뀌면 올려서 기존 캐시를 무효화합니다
+PROFILE_KEY_VERSION = 1
+
+
+def experience_bucket(years):
+    for low, high, label in EXPERIENCE_BUCKETS:
+        if low <= years <= high:
+            return label
+    return EXPERIENCE_BUCKETS[-1][2]
+
+
+def interest_categories(interests):
+    # 세부 관심 분야 -> 상위 분류 (정렬, 중복 제거)
+    return tuple(sorted({category for category, options in CATEGORIES.items()
+                         if any(option in options for option in interests)}))
+
+
+def current_month(now=None):
+    return (now or datetime.now()).strftime("%Y년 %m월")
+
+
+@dataclass(frozen=True)
+class TeacherProfile:
+    """추천 결과에 영향을 주는 입력만 담은 정규화된 프로필 (이름은 제외)."""
+    school_level: str
+    experience: str
+    subject: str
+    interests: tuple
+    preference: str
+    time_preference: tuple
+    month: str
+
+    def key(self):
+        payload = json.dumps(asdict(self), ensure_ascii=False, sort_keys=True)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"v{PROFILE_KEY_VERSION}:{digest}"
+
+
+def normalize_profile(teaching_experience, school_level, subject, selected_interests,
+                      preference, time_preference, now=None, month=None):
+    return TeacherProfile(
+        school_level=school_level,
+        experience=experience_bucket(int(teaching_experience)),
+        subject=" ".join((subject or "").split()),
+        interests=tuple(sorted(set(selected_interests))),
+        preference=preference,
+        time_preference=tuple(sorted(set(time_preference or []))),
+        month=month or current_month(now),
+    )
+
+
+def build_recommendation_prompt(profile):
+    subject = profile.subject
+    return f"""
+            당신은 대한민국 교육 현장에 대한 이해가 깊고, 교사들의 전문성 개발을 돕는 데 열정적인 교육 컨설턴트입니다.
+            다음은 연수 추천을 요청한 교사의 정보입니다:
+
+            - 교직 경력: {profile.experience}
+            - 학교급: {profile.school_level}
+            - 담당 과목/학년: {subject if subject else "미입력"}
+            - 주요 관심 분야: {', '.join(profile.interests)}
+            - 선호 연수 형태: {profile.preference}
+            - 선호 연수 시간: {', '.join(profile.time_preference) if profile.time_preference else "미입력"}
+            - 현재 시점: {profile.month}
+
+            **요청사항:**
+            위 교사의 정보(특히 경력, 학교급, 담당과목, 관심분야)를 면밀히 분석하여, 실제 교육 현장에서 즉시 적용 가능하고 교사의 전문성 성장에 실질적인 도움을 줄 수 있는 연수 3가지를 추천해주세요.
+            추천 시 다음 사항을 반드시 고려하고, 결과는 아래 지정된 JSON 형식으로만 답변해주세요. 다른 설명은 절대 추가하지 마세요.
+
+            **고려사항:**
+            1.  **실질적 도움:** 연수 내용이 교사의 현재 담당 업무나 관심 분야와 어떻게 직접적으로 연결되는지, 어떤 교육적 효과를 기대할 수 있는지 명확히 제시해야 합니다.
+            2.  **현장 적용성:** 배운 내용을 교실 수업, 학생 지도, 동료 교사와의 협업 등에 구체적으로 어떻게 적용할 수 있는지 실용적인 팁이나 아이디어를 포함해야 합니다.
+            3.  **성장 단계 고려:** 교사의 경력(저경력/중견/고경력)과 학교급에 맞는 연수 내용과 깊이를 고려하여 추천해야 합니다. 예를 들어, 저경력 교사에게는 기본적인 교수법이나 학급 운영 연수가, 고경력 교사에게는 연구나 리더십 관련 연수가 더 적합할 수 있습니다.
+            4.  **최신 동향 반영:** AI 교육, 디지털 전환, 기후위기 등 최신 교육 트렌드와 정책 방향을 반영한 연수를 우선적으로 고려해주세요 (교사의 관심사와 부합할 경우).
+            5.  **구체적인 연수명:** 실제 교육청, 연수원, 대학 등에서 운영할 법한 현실적이고 구체적인 연수 제목을 사용해주세요. (예: "AI 디지털 교과서 활용 수업 디자인 실습", "PBL 기반 학생 참여형 수업 전문가 과정")
+
+            **JSON 출력 형식:**
+            {{
+                "recommended_courses": [
+                    {{
+                        "title": "구체적인 연수 제목",
+                        "category": "연수 카테고리 (예: 교수학습 혁신, 디지털 역량)",
+                        "target_audience": "{profile.school_level} {subject} 교사, {profile.experience} 내외 교사 등 구체적 대상 명시",
+                        "format": "{profile.preference} 또는 추천 형태 (예: 온라인, 혼합형)",
+                        "duration": "연수 기간 (예: 3일, 15시간)",
+                        "credits": "이수 학점 (예: 1학점)",
+                        "description": "연수의 핵심 내용을 요약 설명",
+                        "benefits": "이 연수를 통해 교사가 얻을 수 있는 구체적인 성장 지점이나 교육적 효과",
+                        "recommendation_reason": "이 교사의 프로필(경력, 관심사 등)과 연관지어 이 연수를 추천하는 구체적인 이유",
+                        "practical_application": "배운 내용을 학교 현장에서 실제 수업이나 학생 지도에 적용할 수 있는 구체적인 방법이나 아이디어 2-3가지"
+                    }},
+                    // ... (총 3개 추천)
+                ]
+            }}
+            """
+
+
+def build_rerank_prompt(profile, candidates_text):
+    # 카탈로그 검색으로 고른 후보 중에서만 고르고 설명하도록 합니다 (연수명을 새로 만들지 않음)
+    subject = profile.subject
+    return f"""
+            당신은 대한민국 교육 현장에 대한 이해가 깊고, 교사들의 전문성 개발을 돕는 데 열정적인 교육 컨설턴트입니다.
+            다음은 연수 추천을 요청한 교사의 정보입니다:
+
+            - 교직 경력: {profile.experience}
+            - 학교급: {profile.school_level}
+            - 담당 과목/학년: {subject if subject else "미입력"}
+            - 주요 관심 분야: {', '.join(profile.interests)}
+            - 선호 연수 형태: {profile.preference}
+            - 선호 연수 시간: {', '.join(profile.time_preference) if profile.time_preference else "미입력"}
+            - 현재 시점: {profile.month}
+
+            **후보 연수 목록 (번호. 제목 | 카테고리 | 형태 | 학점 | 기간 | 대상 학교급 | 일정 | 설명):**
+{candidates_text}
+
+            **요청사항:**
+            위 후보 중에서 이 교사에게 가장 적합한 연수 3가지를 골라 적합한 순서대로 추천해주세요.
+            후보에 없는 연수를 만들어내지 말고, title/category/format/credits/duration은 후보 목록의 값을 그대로 사용하세요.
+            결과는 아래 JSON 형식으로만 답변하고 다른 설명은 추가하지 마세요.
+
+            **JSON 출력 형식:**
+            {{
+                "recommended_courses": [
+                    {{
+                        "title": "후보 목록의 연수 제목 그대로",
+                        "category": "후보 목록의 카테고리",
+                        "target_audience": "{profile.school_level} {subject} 교사, {profile.experience} 내외 교사 등 구체적 대상 명시",
+                        "format": "후보 목록의 형태",
+                        "duration": "후보 목록의 기간",
+                        "credits": "후보 목록의 학점",
+                        "description": "연수의 핵심 내용을 요약 설명",
+                        "benefits": "이 연수를 통해 교사가 얻을 수 있는 구체적인 성장 지점이나 교육적 효과",
+                        "recommendation_reason": "이 교사의 프로필(경력, 관심사 등)과 연관지어 이 연수를 추천하는 구체적인 이유",
+                        "practical_application": "배운 내용을 학교 현장에서 실제 수업이나 학생 지도에 적용할 수 있는 구체적인 방법이나 아이디어 2-3가지"
+                    }},
+                    // ... (총 3개 추천)
+                ]
+            }}
+            """
+
+
+def parse_recommendations(content):
+    # json.JSONDecodeError는 호출하는 쪽에서 처리합니다
+    return json.loads(content).get("recommended_courses", [])
+
+
+def build_chat_system_prompt(teacher, recommended_courses):
+    # 질문은 user 메시지로 따로 보내고, 이 프롬프트는 같은 세션 안에서 바이트 단위로 같게 유지해
+    # 업스트림 프롬프트 캐시가 적용되도록 합니다 (시각, 질문 등 매번 바뀌는 값을 넣지 마세요)
+    # teacher: 사이드바에서 제출한 프로필 (name, experience, school_level, subject, interests, preference, time_preference)
+    interests_text = ', '.join(teacher.get("interests") or []) or '미선택'
+    time_preference = teacher.get("time_preference") or []
+    recommended_courses_summary = "\n".join([f"- {c.get('title', '')}: {c.get('description', '')}" for c in recommended_courses]) if recommended_courses else "아직 추천된 연수 없음"
+    return f"""
+        당신은 '따뜻한 연수 도우미' 챗봇입니다. 교사의 성장을 진심으로 응원하며, 친절하고 상세하게 답변해야 합니다.
+
+        **챗봇의 역할:**
+        1.  교사의 질문 의도를 파악하고, 아래 교사 정보와 추천된 연수 목록을 바탕으로 **매우 구체적이고 실용적인 답변**을 제공합니다.
+        2.  추천된 연수에 대한 **심층 질문**(예: 특정 연수의 실제 후기, 유사 연수 비교, 연수 내용의 현장 적용 방안 심화)에 상세히 답변합니다.
+        3.  추천 목록 외에 **새로운 연수 정보를 질문**하면, 교사의 프로필에 맞춰 관련성 높은 정보를 탐색하여 안내합니다 (실제 검색 기능은 없으므로, 그럴듯한 정보를 생성).
+        4.  연수 이수 후의 **성장 경로**나 **역량 개발**에 대한 조언을 제공합니다.
+        5.  **따뜻하고 공감하는 어조**를 사용하며, 교사의 노고를 격려하는 메시지를 포함합니다.
+        6.  답변은 명확하고 이해하기 쉽게, 필요시 **불렛 포인트나 단계별 설명**을 활용합니다.
+        7.  정보가 부족하거나 확실하지 않을 때는 솔직하게 인정하고, 추가 정보를 찾을 수 있는 방법을 안내합니다.
+        8.  '지난 대화 요약'과 이전 대화가 주어지면 그 맥락을 이어서 답변합니다.
+
+        **교사 정보:**
+        - 이름: {teacher.get("name") or "익명"}
+        - 경력: {teacher.get("experience", "미입력")}년차
+        - 학교급: {teacher.get("school_level") or "미입력"}
+        - 담당: {teacher.get("subject") or "미입력"}
+        - 관심 분야: {interests_text}
+        - 선호 형태/시간: {teacher.get("preference") or "미입력"} / {', '.join(time_preference) if time_preference else "미입력"}
+
+        **현재 추천된 연수 목록 (참고용):**
+        {recommended_courses_summary}
+        """
@@ -0,0 +1,155 @@
+"""세션별 상담 기록과 추천 결과 저장소.
+
+대화가 길어져도 세션당 메모리가 늘지 않도록 최근 window개의 메시지만 메모리에 두고,
+모든 메시지는 SQLite에 session_id별로 바로 기록합니다. 새로고침으로 세션 상태가 사라져도
+URL의 세션 id로 대화와 추천 결과를 다시 불러옵니다.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+
+
+class SessionStore:
+    def __init__(self, path, ttl_days=30):
+        self.path = path
+        self.ttl = ttl_days * 24 * 3600
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # 메시지마다 커밋하므로 WAL에서 안전한 NORMAL로 fsync 횟수를 줄입니다
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, "
+            "created_at REAL NOT NULL, PRIMARY KEY (session_id, seq))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, state BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def append(self, session_id, role, content, now=None):
+        """메시지를 세션 끝에 붙이고 그 seq를 돌려줍니다.
+
+        같은 세션을 연 탭이나 워커가 여럿이어도 겹치지 않도록 seq는 쓰기 잠금 안에서 정합니다.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT MAX(seq) FROM messages WHERE session_id = ?", (session_id,)).fetchone()
+                seq = 0 if row[0] is None else row[0] + 1
+                self._conn.execute(
+                    "INSERT INTO messages (session_id, seq, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (session_id, seq, role, content, now or time.time()),
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return seq
+
+    def messages(self, session_id, start, stop):
+        """seq가 [start, stop)인 메시지를 순서대로 돌려줍니다."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (session_id, start, stop),
+            ).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def count(self, session_id):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(seq) FROM messages WHERE session_id = ?", (session_id,)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def save_state(self, session_id, state, now=None):
+        payload = zlib.compress(json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, state, updated_at) VALUES (?, ?, ?)",
+                (session_id, payload, now or time.time()),
+            )
+            self._conn.commit()
+
+    def load_state(self, session_id):
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return None if row is None else json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def purge_expired(self, now=None):
+        # 마지막 활동 뒤 ttl이 지난 세션의 기록을 지웁니다
+        cutoff = (now or time.time()) - self.ttl
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM messages WHERE session_id IN ("
+                "SELECT session_id FROM messages GROUP BY session_id HAVING MAX(created_at) <= ? "
+                "EXCEPT SELECT session_id FROM sessions WHERE updated_at > ?)",
+                (cutoff, cutoff),
+            )
+            self._conn.execute("DELETE FROM sessions WHERE updated_at <= ?", (cutoff,))
+            self._conn.commit()
+
+
+class ChatHistory:
+    """한 세션의 상담 기록. 리스트처럼 len()과 절대 위치 슬라이싱을 지원합니다.
+
+    메모리에는 최근 window개만 있고, 그보다 앞의 메시지를 자르면 저장소에서 읽어 옵니다.
+    """
+
+    def __init__(self, store, session_id, window=24):
+        self.store = store
+        self.session_id = session_id
+        self._recent = deque(maxlen=window)
+        self._total = store.count(session_id)
+        self._recent.extend(store.messages(session_id, max(0, self._total - window), self._total))
+
+    def __len__(self):
+        return self._total
+
+    def __bool__(self):
+        return self._total > 0
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._total)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self._slice(start, stop)
+        if index < 0:
+            index += self._total
+        if not 0 <= index < self._total:
+            raise IndexError(index)
+        return self._slice(index, index + 1)[0]
+
+    def append(self, message):
+        seq = self.store.append(self.session_id, message["role"], message["content"])
+        if seq != self._total:
+            # 같은 세션을 연 다른 탭이 그사이 남긴 메시지가 있으면 저장소 기준으로 다시 맞춥니다
+            self._total = seq
+            self._recent.clear()
+            self._recent.extend(self.store.messages(self.session_id, max(0, seq - self._recent.maxlen), seq))
+        self._recent.append({"role": message["role"], "content": message["content"]})
+        self._total += 1
+
+    def tail(self, n):
+        return self._slice(max(0, self._total - n), self._total)
+
+    def _slice(self, start, stop):
+        if start >= stop:
+            return []
+        offset = self._total - len(self._recent)   # 메모리에 있는 첫 메시지의 위치
+        if start >= offset:
+            return list(self._recent)[start - offset:stop - offset]
+        older = self.store.messages(self.session_id, start, min(stop, offset))
+        return older + list(self._recent)[:max(0, stop - offset)]
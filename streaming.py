@@ -0,0 +1,133 @@
+"""스트리밍 응답 처리.
+
+추천 응답은 JSON 한 덩어리지만, `recommended_courses` 배열 안의 연수 객체가
+하나 완성될 때마다 바로 꺼내 카드로 그릴 수 있도록 점진적으로 파싱합니다.
+"""
+import codecs
+import hashlib
+import json
+
+from telemetry import usage_tokens
+
+COURSES_KEY = "recommended_courses"
+# 연수 3개 JSON의 상한. 요청 한도(TPM)도 이 값으로 미리 잡고 끝나면 실제 사용량으로 정산합니다
+RECOMMEND_MAX_TOKENS = 1200
+
+
+class CourseStreamParser:
+    """조각난 JSON 텍스트(또는 UTF-8 바이트)를 받아 완성된 연수 객체를 돌려줍니다.
+
+    조각이 한글 한 글자의 UTF-8 바이트 중간이나 문자열 이스케이프(`\\"`, `\\u` 등)
+    중간에서 끊겨도 상태를 이어서 처리합니다.
+    """
+
+    def __init__(self, key=COURSES_KEY):
+        self.key = key
+        self.text = ""
+        self.courses = []
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None
+        self._array_depth = None
+        self._object_start = None
+
+    def feed(self, chunk):
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        if not chunk:
+            return []
+        self.text += chunk
+        found = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._array_depth is None:
+                        self._last_key = json.loads(text[self._string_start:i + 1])
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                self._depth += 1
+                if ch == "[" and self._depth == 2 and self._array_depth is None and self._last_key == self.key:
+                    self._array_depth = self._depth
+                elif ch == "{" and self._array_depth is not None and self._depth == self._array_depth + 1:
+                    self._object_start = i
+            elif ch in "}]":
+                if (ch == "}" and self._object_start is not None
+                        and self._depth == self._array_depth + 1):
+                    course = json.loads(text[self._object_start:i + 1])
+                    self._object_start = None
+                    self.courses.append(course)
+                    found.append(course)
+                elif ch == "]" and self._depth == self._array_depth:
+                    # 배열이 닫히면 같은 키가 다시 나와도 무시합니다
+                    self._array_depth = -1
+                self._depth -= 1
+            elif ch == "," and self._depth == 1:
+                self._last_key = None
+        self._pos = len(text)
+        return found
+
+    def close(self):
+        # 남은 바이트까지 처리한 뒤 전체 JSON을 검증합니다 (JSONDecodeError는 호출하는 쪽에서 처리)
+        self.feed(self._decoder.decode(b"", final=True))
+        return json.loads(self.text).get(self.key, [])
+
+
+def iter_stream_text(stream, on_usage=None):
+    # OpenAI 스트리밍 청크에서 텍스트 조각만 꺼냅니다
+    # stream_options={"include_usage": True}로 요청하면 마지막 청크의 사용량을 on_usage로 넘깁니다
+    for chunk in stream:
+        usage = getattr(chunk, "usage", None)
+        if usage is not None and on_usage is not None:
+            on_usage(usage)
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if content:
+            yield content
+
+
+def stream_recommendations(llm, prompt, on_course=None, model="gpt-4o", max_tokens=RECOMMEND_MAX_TOKENS, **kwargs):
+    # 추천 요청을 스트리밍으로 보내고 연수 객체가 완성될 때마다 on_course를 부릅니다
+    telemetry = llm.telemetry
+    session_id = kwargs.get("session_id")
+    stream = llm.create(
+        model=model,
+        messages=[{"role": "system", "content": prompt}],
+        response_format={"type": "json_object"},
+        max_tokens=max_tokens,
+        stream=True,
+        stream_options={"include_usage": True},
+        **kwargs,
+    )
+    parser = CourseStreamParser()
+    on_usage = lambda usage: telemetry.record_usage(session_id, model, *usage_tokens(usage))
+    for text in iter_stream_text(stream, on_usage=on_usage):
+        for course in parser.feed(text):
+            if on_course is not None:
+                on_course(course)
+    with telemetry.span("recommend_json_parse"):
+        courses = parser.close()
+    # 스트리밍 중에 꺼내지 못한 객체가 있으면 마저 전달합니다
+    if on_course is not None:
+        for course in courses[len(parser.courses):]:
+            on_course(course)
+    return courses
+
+
+def prompt_key(prompt, model="gpt-4o"):
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
@@ -0,0 +1,199 @@
+"""가벼운 지연 시간/사용량 계측.
+
+추천·상담 경로의 단계별 소요 시간, 토큰 사용량, 캐시 적중, 재시도, 오류를 모읍니다.
+- JSONL 이벤트 로그 (크기 기준으로 회전)
+- Prometheus 텍스트 형식 파일 (node_exporter textfile collector 등에서 수집)
+- 관리자 패널용 p50/p95와 세션별 토큰 합계
+
+꺼져 있으면 span()은 공용 nullcontext를, 나머지 메서드는 바로 반환하므로 비용이 거의 없습니다.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+# 초 단위 히스토그램 경계
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+_NOOP = nullcontext()
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = [*key, *extra]
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def usage_tokens(usage):
+    # OpenAI usage 객체 -> (입력, 출력, 캐시된 입력) 토큰 수
+    details = getattr(usage, "prompt_tokens_details", None)
+    return usage.prompt_tokens, usage.completion_tokens, getattr(details, "cached_tokens", 0) or 0
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Telemetry:
+    def __init__(self, enabled=False, log_path=None, prometheus_path=None, log_max_bytes=10_000_000,
+                 log_backups=5, prometheus_interval=10.0, recent_samples=1000, max_sessions=1000):
+        self.enabled = enabled
+        self.prometheus_path = prometheus_path
+        self.prometheus_interval = prometheus_interval
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)          # (name, labels) -> 값
+        self._histograms = {}                        # (name, labels) -> [bucket counts, sum, count]
+        self._recent = defaultdict(lambda: deque(maxlen=recent_samples))
+        # 세션별 토큰 합계는 최근에 호출한 max_sessions개만 남깁니다 (전체 합계는 카운터에 있습니다)
+        self._sessions = OrderedDict()               # session -> 토큰 합계
+        self._last_export = 0.0
+        self._logger = None
+        if enabled and log_path:
+            directory = os.path.dirname(log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._logger = logging.getLogger(f"telemetry.{id(self)}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=log_max_bytes,
+                                                           backupCount=log_backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger.addHandler(handler)
+        if enabled and prometheus_path:
+            # 주기 사이에 쌓인 값도 종료 시 남깁니다
+            atexit.register(self.export_prometheus, True)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.environ.get("TELEMETRY_ENABLED", "0") == "1",
+            log_path=os.environ.get("TELEMETRY_LOG_PATH", ".cache/telemetry.jsonl"),
+            prometheus_path=os.environ.get("TELEMETRY_PROMETHEUS_PATH", ".cache/metrics.prom"),
+        )
+
+    def span(self, name, **labels):
+        if not self.enabled:
+            return _NOOP
+        return self._span(name, labels)
+
+    @contextmanager
+    def _span(self, name, labels):
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, error=error, **labels)
+
+    def observe(self, name, seconds, error=None, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+            index = bisect_left(BUCKETS, seconds)
+            if index < len(BUCKETS):
+                histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+            self._recent[name].append(seconds)
+            if error:
+                self._counters[("errors_total", _label_key({"stage": name, "type": error}))] += 1
+        self._emit({"type": "span", "name": name, "seconds": round(seconds, 6), "error": error, **labels})
+
+    def incr(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[(name, _label_key(labels))] += value
+        self._emit({"type": "counter", "name": name, "value": value, **labels})
+
+    def record_usage(self, session_id, model, prompt_tokens, completion_tokens, cached_tokens=0):
+        if not self.enabled:
+            return
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                                        "cached_tokens": 0}
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            session["requests"] += 1
+            session["prompt_tokens"] += prompt_tokens
+            session["completion_tokens"] += completion_tokens
+            session["cached_tokens"] += cached_tokens
+            for kind, value in (("prompt", prompt_tokens), ("completion", completion_tokens), ("cached", cached_tokens)):
+                self._counters[("llm_tokens_total", _label_key({"model": model, "kind": kind}))] += value
+        self._emit({"type": "usage", "session": session_id, "model": model, "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens, "cached_tokens": cached_tokens})
+
+    def summary(self):
+        # 관리자 패널용: 단계별 p50/p95(ms), 카운터, 세션별 토큰
+        with self._lock:
+            stages = {name: {"count": len(values), "p50_ms": percentile(values, 50) * 1000,
+                             "p95_ms": percentile(values, 95) * 1000}
+                      for name, values in self._recent.items()}
+            counters = {f"{name}{_format_labels(labels)}": value for (name, labels), value in self._counters.items()}
+            sessions = {sid: dict(values) for sid, values in self._sessions.items()}
+        return {"stages": stages, "counters": counters, "sessions": sessions}
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append(f"recommend_{name}{_format_labels(labels)} {value:g}")
+            for (name, labels), (buckets, total, count) in sorted(self._histograms.items()):
+                metric = f"recommend_{name}_seconds"
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS, buckets):
+                    cumulative += bucket
+                    lines.append(f"{metric}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f'{metric}_bucket{_format_labels(labels, [("le", "+Inf")])} {count}')
+                lines.append(f"{metric}_sum{_format_labels(labels)} {total:.6f}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self, force=False):
+        if not self.enabled or not self.prometheus_path:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_export < self.prometheus_interval:
+            return
+        self._last_export = now
+        directory = os.path.dirname(self.prometheus_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 수집기가 반쯤 쓴 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체합니다
+        tmp_path = f"{self.prometheus_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, self.prometheus_path)
+
+    def _emit(self, event):
+        if self._logger is not None:
+            event["ts"] = round(time.time(), 3)
+            self._logger.info(json.dumps(event, ensure_ascii=False))
+        self.export_prometheus()
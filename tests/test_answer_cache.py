@@ -0,0 +1,67 @@
+"""AnswerCache 만료/용량 테스트."""
+import sqlite3
+
+from answer_cache import AnswerCache, context_key
+from recommender import interest_categories
+
+T = 1_000_000.0
+
+
+def answers(cache):
+    # 메모리에 남은 key의 답변 본문 (본문은 SQLite에만 있습니다)
+    keys = [key for shard in cache._shards.values() for key in shard.keys]
+    rows = cache._conn.execute(f"SELECT answer FROM answers WHERE key IN ({','.join('?' * len(keys))})", keys)
+    return sorted(row[0] for row in rows)
+
+
+def stored(path):
+    with sqlite3.connect(path) as conn:
+        return [row[0] for row in conn.execute("SELECT answer FROM answers ORDER BY answer")]
+
+
+def test_expired_answers_are_evicted_before_lru_when_full(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), capacity=3, max_age=100)
+    cache.store("연수 학점은 어떻게 인정되나요?", 1, "A", now=T)
+    cache.store("방학 중 연수도 있나요?", 1, "B", now=T + 10)
+    cache.store("원격 연수 추천해 주세요", 2, "C", now=T + 90)
+    assert cache.lookup("연수 학점은 어떻게 인정되나요?", 1, now=T + 95)[0] == "A"
+    # A가 가장 최근에 쓰였지만 만료되었으므로 먼저 지워집니다
+    cache.store("연수 신청은 언제까지인가요?", 2, "D", now=T + 105)
+    assert answers(cache) == ["B", "C", "D"]
+    assert stored(cache.path) == ["B", "C", "D"]
+
+
+def test_store_purges_expired_answers_periodically(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), max_age=100, purge_interval=50)
+    cache._next_purge = T + 50
+    cache.store("연수 학점은 어떻게 인정되나요?", 1, "A", now=T)
+    cache.store("방학 중 연수도 있나요?", 1, "B", now=T + 60)
+    assert answers(cache) == ["A", "B"]
+    cache.store("원격 연수 추천해 주세요", 2, "C", now=T + 120)
+    assert answers(cache) == ["B", "C"]
+    assert stored(cache.path) == ["B", "C"]
+
+
+def test_load_deletes_expired_rows(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    cache = AnswerCache(path)
+    cache.store("연수 학점은 어떻게 인정되나요?", 1, "A", now=T)
+    reopened = AnswerCache(path)
+    assert len(reopened) == 0
+    assert stored(path) == []
+
+
+def test_in_memory_cache_reads_answers_from_sqlite():
+    cache = AnswerCache(threshold=0.9)
+    cache.store("연수 학점은 어떻게 인정되나요?", 1, "A", now=T)
+    assert not hasattr(cache._shards[1], "answers")
+    assert cache.lookup("연수 학점은 어떻게 인정되나요?", 1, now=T + 1)[0] == "A"
+    assert cache.lookup("연수 학점은 어떻게 인정되나요?", 2, now=T + 1)[0] is None
+
+
+def test_context_key_separates_interest_categories_and_preference():
+    base = context_key("중학교", "3~5년차", interest_categories(["AI 기반 맞춤형 교육"]), "온라인")
+    # 같은 상위 분류의 다른 세부 항목은 같은 context를 씁니다
+    assert base == context_key("중학교", "3~5년차", interest_categories(["하브루타/토론 수업"]), "온라인")
+    assert base != context_key("중학교", "3~5년차", interest_categories(["회복적 생활교육"]), "온라인")
+    assert base != context_key("중학교", "3~5년차", interest_categories(["AI 기반 맞춤형 교육"]), "오프라인")
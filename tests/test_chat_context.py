@@ -0,0 +1,47 @@
+"""ChatContext 요약 시점 테스트."""
+from types import SimpleNamespace
+
+from chat_context import ChatContext
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="요약"))])
+
+
+def turns(n, answer="네, 가능합니다."):
+    history = []
+    for i in range(n):
+        history.append({"role": "user", "content": f"{i}번째 질문입니다"})
+        history.append({"role": "assistant", "content": answer})
+    return history
+
+
+def test_no_summary_while_everything_fits_in_the_budget():
+    context = ChatContext(budget_tokens=1500)
+    history = turns(20)
+    assert context.recent(history) == history
+    assert context.dropped(history) == 0
+    assert not context.needs_summary(history)
+
+
+def test_summary_once_enough_messages_fall_out_of_the_budget():
+    context = ChatContext(budget_tokens=1500)
+    long_answer = "연수 안내 " * 100  # 답변 하나가 예산의 3분의 1 가까이 차지합니다
+    history = turns(5, long_answer)
+    assert 0 < context.dropped(history) < context.summarize_every
+    assert not context.needs_summary(history)
+    history = turns(6, long_answer)
+    assert context.dropped(history) >= context.summarize_every
+    assert context.needs_summary(history)
+
+    llm = FakeLLM()
+    context.summarize(llm, history)
+    assert llm.calls == 1
+    assert context.summary == "요약"
+    assert context.summarized == len(history) - context.keep_recent
+    assert not context.needs_summary(history)
@@ -0,0 +1,50 @@
+"""SessionStore / ChatHistory 테스트."""
+from session_store import ChatHistory, SessionStore
+
+
+def message(role, content):
+    return {"role": role, "content": content}
+
+
+def test_history_keeps_a_window_in_memory_and_reads_older_messages_from_the_store(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    history = ChatHistory(store, "s", window=4)
+    for i in range(10):
+        history.append(message("user", f"q{i}"))
+    assert len(history) == 10
+    assert len(history._recent) == 4
+    assert [m["content"] for m in history.tail(3)] == ["q7", "q8", "q9"]
+    assert [m["content"] for m in history[2:6]] == ["q2", "q3", "q4", "q5"]
+    assert history[-1]["content"] == "q9"
+
+    reopened = ChatHistory(store, "s", window=4)
+    assert [m["content"] for m in reopened] == [f"q{i}" for i in range(10)]
+
+
+def test_two_tabs_on_the_same_session_do_not_overwrite_each_other(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    first = ChatHistory(store, "s", window=4)
+    second = ChatHistory(store, "s", window=4)
+    first.append(message("user", "a1"))
+    second.append(message("user", "b1"))
+    first.append(message("assistant", "a2"))
+    second.append(message("assistant", "b2"))
+
+    assert [m["content"] for m in store.messages("s", 0, 10)] == ["a1", "b1", "a2", "b2"]
+    assert len(first) == 3
+    assert [m["content"] for m in first.tail(3)] == ["a1", "b1", "a2"]
+    assert len(second) == 4
+    assert [m["content"] for m in second.tail(4)] == ["a1", "b1", "a2", "b2"]
+
+
+def test_purge_expired_removes_stale_sessions(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"), ttl_days=1)
+    store.append("old", "user", "q", now=1000.0)
+    store.save_state("old", {"x": 1}, now=1000.0)
+    store.append("new", "user", "q")
+    store.save_state("new", {"x": 2})
+    store.purge_expired()
+    assert store.count("old") == 0
+    assert store.load_state("old") is None
+    assert store.count("new") == 1
+    assert store.load_state("new") == {"x": 2}
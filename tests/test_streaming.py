@@ -0,0 +1,99 @@
+"""CourseStreamParser를 녹화해 둔 조각 목록으로 재생하는 오프라인 테스트."""
+import json
+
+import pytest
+
+from streaming import CourseStreamParser
+
+COURSES = [
+    {"title": "AI 디지털 교과서 활용 수업 디자인", "credits": "1학점",
+     "description": "따옴표 \"인용\"과 역슬래시 \\ 경로, 줄바꿈\n이 들어간 설명"},
+    {"title": "PBL 기반 학생 참여형 수업", "credits": "2학점", "description": "중괄호 {와 대괄호 ]가 문자열 안에 있음"},
+    {"title": "기후위기 생태전환 교육", "credits": "1학점", "description": "é 같은 유니코드 이스케이프"},
+]
+# 스트리밍 응답처럼 ensure_ascii=False로 만든 본문 (한글은 UTF-8 3바이트)
+PAYLOAD = json.dumps({"recommended_courses": COURSES}, ensure_ascii=False)
+
+
+def split_at(data, cuts):
+    return [data[start:stop] for start, stop in zip([0, *cuts], [*cuts, len(data)])]
+
+
+def replay(chunks):
+    parser = CourseStreamParser()
+    streamed = []
+    for chunk in chunks:
+        streamed.extend(parser.feed(chunk))
+    return streamed, parser.close()
+
+
+# 녹화해 둔 조각 목록: 한글 글자의 UTF-8 바이트 중간, 문자열 이스케이프 중간, 객체 경계에서 끊깁니다
+RECORDED_TEXT = [
+    '{"recommended_courses": [{"title": "AI 디지털 교과서 활용 수업 디자인", "credits": "1학점", "description": "따옴표 \\',
+    '"인용\\',
+    '"과 역슬래시 \\',
+    '\\ 경로, 줄바꿈\\',
+    'n이 들어간 설명"}',
+    ', {"title": "PBL 기반 학생 참여형 수업", "credits": "2학점", "description": "중괄호 {와 대괄호 ]가 문자열 안에 있음"}, ',
+    '{"title": "기후위기 생태전환 교육", "credits": "1학점", "description": "\\u00',
+    'e9 같은 유니코드 이스케이프"}]}',
+]
+
+
+def test_recorded_text_chunks():
+    assert "".join(RECORDED_TEXT) == json.dumps({"recommended_courses": COURSES}, ensure_ascii=False).replace("é", "\\u00e9")
+    streamed, courses = replay(RECORDED_TEXT)
+    assert streamed == COURSES
+    assert courses == COURSES
+
+
+def test_recorded_byte_chunks_split_inside_korean_character():
+    data = PAYLOAD.encode("utf-8")
+    first = data.index("디지털".encode("utf-8"))
+    second = data.index("참여형".encode("utf-8"))
+    # 한글 글자의 첫 바이트 뒤, 두 번째 바이트 뒤에서 끊습니다
+    chunks = split_at(data, [first + 1, second + 2, second + 4])
+    with pytest.raises(UnicodeDecodeError):
+        chunks[0].decode("utf-8")
+    streamed, courses = replay(chunks)
+    assert streamed == COURSES
+    assert courses == COURSES
+
+
+def test_byte_chunks_split_inside_escape():
+    data = PAYLOAD.encode("utf-8")
+    backslash = data.index(b'\\"')
+    chunks = split_at(data, [backslash + 1, data.index(b"\\\\") + 1])
+    streamed, courses = replay(chunks)
+    assert streamed == COURSES
+    assert courses == COURSES
+
+
+@pytest.mark.parametrize("as_bytes", [False, True])
+def test_every_single_split(as_bytes):
+    data = PAYLOAD.encode("utf-8") if as_bytes else PAYLOAD
+    for cut in range(1, len(data)):
+        streamed, courses = replay(split_at(data, [cut]))
+        assert streamed == COURSES, cut
+        assert courses == COURSES
+
+
+def test_one_byte_chunks():
+    data = PAYLOAD.encode("utf-8")
+    streamed, courses = replay([data[i:i + 1] for i in range(len(data))])
+    assert streamed == COURSES
+    assert courses == COURSES
+
+
+def test_courses_are_emitted_as_soon_as_each_object_closes():
+    parser = CourseStreamParser()
+    end_of_first = PAYLOAD.index("}, {") + 1
+    assert parser.feed(PAYLOAD[:end_of_first]) == COURSES[:1]
+    assert parser.feed(PAYLOAD[end_of_first:]) == COURSES[1:]
+
+
+def test_truncated_stream_raises_on_close():
+    parser = CourseStreamParser()
+    parser.feed(PAYLOAD[:len(PAYLOAD) * 2 // 3])
+    with pytest.raises(json.JSONDecodeError):
+        parser.close()
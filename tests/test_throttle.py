@@ -0,0 +1,154 @@
+"""SingleFlight 동시성 테스트 (로컬 가짜 OpenAI 서버 사용)."""
+import threading
+import time
+
+import pytest
+
+from fake_openai import FAKE_COURSES, FakeOpenAIServer
+from llm_client import ResilientLLM, create_client
+from streaming import prompt_key, stream_recommendations
+from throttle import FlightAbortedError, SingleFlight, TokenBucketLimiter, estimate_tokens
+
+SESSIONS = 8
+PROMPTS = 3
+
+
+@pytest.fixture
+def server():
+    # 모든 세션이 선두의 호출이 끝나기 전에 합류하도록 응답을 조금 늦춥니다
+    server = FakeOpenAIServer(latency=0.3, chunk_size=32, chunk_delay=0.01).start()
+    yield server
+    server.stop()
+
+
+def test_concurrent_sessions_share_one_upstream_call_per_prompt(server):
+    llm = ResilientLLM(create_client("test", base_url=server.base_url),
+                       limiter=TokenBucketLimiter(requests_per_minute=100_000, tokens_per_minute=100_000_000))
+    flights = SingleFlight()
+    prompts = [f"프롬프트 {i}" for i in range(PROMPTS)]
+    barrier = threading.Barrier(SESSIONS * PROMPTS)
+    results = {}
+    errors = []
+
+    def session(name, prompt):
+        streamed = []
+        try:
+            barrier.wait()
+            courses = flights.run_streaming(
+                prompt_key(prompt),
+                lambda publish: stream_recommendations(llm, prompt, publish, session_id=name),
+                on_item=streamed.append,
+                timeout=10,
+            )
+            results[name] = (courses, streamed)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=session, args=(f"{s}-{p}", prompt))
+               for s in range(SESSIONS) for p, prompt in enumerate(prompts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert not errors
+    assert server.request_count == PROMPTS
+    assert flights.leaders == PROMPTS
+    assert flights.followers == (SESSIONS - 1) * PROMPTS
+    assert len(results) == SESSIONS * PROMPTS
+    for courses, streamed in results.values():
+        assert courses == FAKE_COURSES
+        assert streamed == FAKE_COURSES
+
+
+class StopScript(BaseException):
+    """Streamlit의 RerunException/StopException처럼 BaseException을 상속한 중단 신호."""
+
+
+def run_with_follower(flights, produce, leader_on_item):
+    # 선두가 시작한 뒤 대기자 하나가 합류할 때까지 기다렸다가 produce를 진행합니다
+    joined = threading.Event()
+    follower = {"items": []}
+
+    def follow():
+        while flights.leaders == 0:
+            time.sleep(0.001)
+        joined.set()
+        try:
+            follower["result"] = flights.run_streaming("key", produce, on_item=follower["items"].append, timeout=5)
+        except BaseException as e:
+            follower["error"] = e
+
+    def gated_produce(publish):
+        assert joined.wait(5)
+        while flights.followers == 0:
+            time.sleep(0.001)
+        return produce(publish)
+
+    thread = threading.Thread(target=follow)
+    thread.start()
+    try:
+        leader = {"result": flights.run_streaming("key", gated_produce, on_item=leader_on_item, timeout=5)}
+    except BaseException as e:
+        leader = {"error": e}
+    thread.join(5)
+    return leader, follower
+
+
+def test_leader_callback_interrupt_stays_with_the_leader():
+    flights = SingleFlight()
+    leader_items = []
+
+    def produce(publish):
+        for item in (1, 2, 3):
+            publish(item)
+        return [1, 2, 3]
+
+    def leader_on_item(item):
+        leader_items.append(item)
+        raise StopScript()
+
+    leader, follower = run_with_follower(flights, produce, leader_on_item)
+    assert isinstance(leader["error"], StopScript)
+    assert leader_items == [1]
+    assert "error" not in follower
+    assert follower["result"] == [1, 2, 3]
+    assert follower["items"] == [1, 2, 3]
+
+
+def test_leader_interrupt_inside_produce_fails_followers_with_neutral_error():
+    flights = SingleFlight()
+
+    def produce(publish):
+        publish(1)
+        raise StopScript()
+
+    leader, follower = run_with_follower(flights, produce, None)
+    assert isinstance(leader["error"], StopScript)
+    assert isinstance(follower["error"], FlightAbortedError)
+    assert follower["items"] == [1]
+
+
+def test_upstream_error_reaches_every_waiter():
+    flights = SingleFlight()
+
+    def produce(publish):
+        raise ValueError("upstream")
+
+    leader, follower = run_with_follower(flights, produce, None)
+    assert isinstance(leader["error"], ValueError)
+    assert isinstance(follower["error"], ValueError)
+
+
+def test_limiter_settles_streamed_usage_in_both_directions(server):
+    limiter = TokenBucketLimiter(requests_per_minute=100_000, tokens_per_minute=1_000_000)
+    llm = ResilientLLM(create_client("test", base_url=server.base_url), limiter=limiter)
+    messages = [{"role": "user", "content": "안녕하세요"}]
+    for max_tokens in (5000, 1):
+        # 추정치가 실제보다 크면 돌려받고, 작으면(max_tokens=1) 모자란 만큼 더 차감됩니다
+        stream = llm.create(model="gpt-4o", messages=messages, max_tokens=max_tokens, stream=True,
+                            stream_options={"include_usage": True})
+        before = limiter.tokens
+        usage = [chunk.usage for chunk in stream if chunk.usage is not None][0]
+        settled = limiter.tokens - before
+        assert settled == pytest.approx(estimate_tokens(messages, max_tokens) - usage.total_tokens)
@@ -0,0 +1,226 @@
+"""세션 간 요청 합치기(single-flight)와 전역 토큰 버킷 제한.
+
+연수 시간에 여러 교사가 같은 프로필로 거의 동시에 추천을 요청하면 업스트림 호출은
+한 번만 하고 결과를 모두에게 나눠 줍니다. 모든 OpenAI 호출은 분당 요청 수와 분당 토큰 수
+두 버킷을 통과해야 하며, 기다리는 세션들은 돌아가며 한 건씩 차례를 받습니다.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class RateLimitTimeout(Exception):
+    """마감 시간 안에 요청 한도를 얻지 못했습니다."""
+
+
+class FlightAbortedError(Exception):
+    """공유 중인 요청을 맡은 세션이 중단되어 결과를 받지 못했습니다."""
+
+
+def approx_tokens(text):
+    # 한글은 대략 UTF-8 3바이트가 1토큰 안팎이므로 바이트 수로 어림합니다
+    return len(str(text).encode("utf-8")) // 3
+
+
+def estimate_tokens(messages, completion_tokens=1000):
+    return sum(approx_tokens(m.get("content", "")) for m in messages) + 4 * len(messages) + completion_tokens
+
+
+class Flight:
+    """진행 중인 업스트림 호출 하나. 중간 결과(연수 카드)와 최종 결과를 대기자에게 전달합니다."""
+
+    def __init__(self):
+        self.items = []
+        self.result = None
+        self.error = None
+        self.done = False
+        self._cond = threading.Condition()
+
+    def publish(self, item):
+        with self._cond:
+            self.items.append(item)
+            self._cond.notify_all()
+
+    def finish(self, result):
+        with self._cond:
+            self.result = result
+            self.done = True
+            self._cond.notify_all()
+
+    def fail(self, error):
+        with self._cond:
+            self.error = error
+            self.done = True
+            self._cond.notify_all()
+
+    def iter_items(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.items) and not self.done:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("공유 중인 요청의 응답을 기다리다 시간이 초과되었습니다.")
+                    self._cond.wait(remaining)
+                if index < len(self.items):
+                    item = self.items[index]
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            index += 1
+            yield item
+
+    def wait(self, timeout=None):
+        for _ in self.iter_items(timeout):
+            pass
+        return self.result
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def begin(self, key):
+        """(flight, 선두 여부)를 돌려줍니다. 선두만 실제로 호출하고 끝나면 end()를 불러야 합니다."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.followers += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            self.leaders += 1
+            return flight, True
+
+    def end(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def run_streaming(self, key, produce, on_item=None, timeout=None):
+        """produce(publish)를 선두만 실행하고, publish된 중간 결과는 모든 대기자의 on_item으로 전달합니다.
+
+        선두의 on_item에서 난 오류(Streamlit 재실행 요청 등)는 다른 대기자에게 넘기지 않고,
+        호출을 끝까지 마친 뒤 선두에게만 다시 던집니다.
+        """
+        flight, leader = self.begin(key)
+        if not leader:
+            for item in flight.iter_items(timeout):
+                if on_item is not None:
+                    on_item(item)
+            return flight.result
+
+        callback_error = None
+
+        def publish(item):
+            nonlocal callback_error
+            flight.publish(item)
+            if on_item is not None and callback_error is None:
+                try:
+                    on_item(item)
+                except BaseException as e:
+                    # 이후 중간 결과는 선두 화면에 그리지 않고 대기자에게만 전달합니다
+                    callback_error = e
+
+        try:
+            result = produce(publish)
+        except Exception as e:
+            flight.fail(e)
+            raise
+        except BaseException:
+            # 선두 스레드의 중단 신호는 다른 세션의 스레드에서 다시 던지지 않습니다
+            flight.fail(FlightAbortedError("공유 중인 요청이 중단되었습니다."))
+            raise
+        else:
+            flight.finish(result)
+        finally:
+            self.end(key, flight)
+        if callback_error is not None:
+            raise callback_error
+        return result
+
+
+class TokenBucketLimiter:
+    """분당 요청 수(rpm)와 분당 토큰 수(tpm)를 함께 제한하는 토큰 버킷.
+
+    대기열은 세션별로 나뉘고, 한도가 생기면 세션을 돌아가며 한 건씩 허용하므로
+    한 세션이 요청을 몰아 보내도 다른 세션이 밀려나지 않습니다.
+    """
+
+    def __init__(self, requests_per_minute=500, tokens_per_minute=30000):
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self.requests = self.request_capacity
+        self.tokens = self.token_capacity
+        self._updated = time.monotonic()
+        self._queues = OrderedDict()  # session -> deque(ticket)
+        self._cond = threading.Condition()
+        self.granted = 0
+        self.timeouts = 0
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self.requests = min(self.request_capacity, self.requests + elapsed * self.request_capacity / 60.0)
+        self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_capacity / 60.0)
+
+    def _wait_time(self, tokens):
+        request_short = max(0.0, 1.0 - self.requests)
+        token_short = max(0.0, tokens - self.tokens)
+        return max(request_short * 60.0 / self.request_capacity, token_short * 60.0 / self.token_capacity)
+
+    def _is_next(self, session, ticket):
+        first_session = next(iter(self._queues))
+        return first_session == session and self._queues[session][0] is ticket
+
+    def _leave(self, session, ticket, used_turn):
+        queue = self._queues[session]
+        queue.remove(ticket)
+        if queue:
+            if used_turn:
+                # 이 세션은 차례를 썼으니 맨 뒤로 보냅니다
+                self._queues.move_to_end(session)
+        else:
+            del self._queues[session]
+        self._cond.notify_all()
+
+    def acquire(self, tokens, session=None, timeout=None):
+        tokens = min(float(tokens), self.token_capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = object()
+        with self._cond:
+            self._queues.setdefault(session, deque()).append(ticket)
+            while True:
+                now = time.monotonic()
+                wait = None
+                if self._is_next(session, ticket):
+                    self._refill(now)
+                    wait = self._wait_time(tokens)
+                    if wait <= 0:
+                        self.requests -= 1.0
+                        self.tokens -= tokens
+                        self.granted += 1
+                        self._leave(session, ticket, True)
+                        return
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0 or (wait is not None and wait > remaining):
+                        self.timeouts += 1
+                        self._leave(session, ticket, False)
+                        raise RateLimitTimeout("요청 한도를 기다리다 시간이 초과되었습니다.")
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(wait)
+
+    def settle(self, reserved, used):
+        # 미리 받은 추정치와 실제 사용량의 차이만큼 돌려주거나 더 차감합니다
+        # (추정보다 많이 썼으면 버킷이 음수가 되어 다음 요청들이 그만큼 더 기다립니다)
+        delta = min(float(reserved), self.token_capacity) - float(used)
+        if delta == 0:
+            return
+        with self._cond:
+            self.tokens = min(self.token_capacity, self.tokens + delta)
+            self._cond.notify_all()